@@ -1,7 +1,18 @@
 import streamlit as st
 import pandas as pd
 import time
-from scrape_inventory import scrape_cartown
+import io
+from collections import deque
+from functools import partial
+from scrape_inventory import iter_scrape, create_driver, LEAN_BROWSER
+from inventory_store import InventoryStore
+from page_cache import PageCache, DEFAULT_TTL as PAGE_CACHE_TTL
+from inventory_schema import write_typed
+from metrics import summary_rows
+from browser_pool import BrowserPool
+from dedupe import POLICIES, POLICY_LABELS
+
+LIVE_PREVIEW_ROWS = 200  # Latest vehicles shown while a scrape is running
 
 st.set_page_config(page_title="Car Town Scraper", page_icon="🚗", layout="wide")
 
@@ -11,45 +22,202 @@ st.markdown("Enter the inventory URL below to start scraping.")
 # Input URL
 url = st.text_input("Target URL", value="https://www.cartownlexington.com/new-vehicles/")
 scrape_all = st.checkbox("Scrape All Pages (Might take a while)", value=False)
+fast_mode = st.checkbox("Fast mode (plain HTTP first, browser only if blocked)", value=True,
+                        help="Fetches pages without Chrome. A browser opens only when the site shows a security check.")
+
+workers = 1
+rate_limit = 2.0
+if scrape_all:
+    col_a, col_b = st.columns(2)
+    workers = col_a.number_input("Parallel workers", min_value=1, max_value=8, value=1,
+                                 help="Pages loaded at the same time (browsers, or HTTP requests in fast mode).")
+    rate_limit = col_b.number_input("Min. seconds between page loads (per site)", min_value=0.0, max_value=30.0, value=2.0, step=0.5)
+
+track_changes = st.checkbox("Track changes between runs (local inventory store)", value=True)
+incremental = False
+if track_changes and scrape_all:
+    incremental = st.checkbox("Stop early once a page has only known, unchanged vehicles", value=False)
+
+resume = False
+if scrape_all:
+    resume = st.checkbox("Resume the last interrupted crawl (checkpoint)", value=False,
+                         help="Continues from the pages saved in scrape_checkpoint.jsonl instead of starting at page 1.")
+dedupe = st.selectbox("Vehicles listed on several pages", POLICIES, format_func=POLICY_LABELS.get,
+                      help="Featured vehicles often repeat on every page; only one row per VIN / stock # is kept.")
+warm_browsers = st.checkbox("Keep browsers open between runs", value=True,
+                            help="Reuses the same Chrome windows (and their cleared security checks) for the next scrape instead of starting Chrome every time.")
+lean = st.checkbox("Lean page loads (no images, fonts, videos or trackers)", value=LEAN_BROWSER,
+                   help="Chrome only downloads what the vehicle list needs and runs hidden (headless). Faster and lighter; untick if a site stops showing vehicles.")
+enrich = st.checkbox("Visit each vehicle's detail page for more fields (mileage, engine, options...)", value=False,
+                     help="One extra page per vehicle, a few at a time; vehicles done in the last day are taken from cache. Much slower on the first run.")
+use_cache = st.checkbox("Reuse recently scraped pages (cache)", value=True,
+                        help=f"Pages fetched in the last {PAGE_CACHE_TTL // 60} minutes are not loaded again, so a failed run can resume quickly.")
+
+
+@st.cache_resource(show_spinner=False)
+def get_browser_pool(lean):
+    # One pool per Streamlit server (and browser kind), shared by every session and rerun
+    return BrowserPool(factory=partial(create_driver, lean=lean))
+
+
+@st.cache_resource(show_spinner=False)
+def get_results():
+    # Finished scrapes per set of inputs, shared by every session: {settings: (finished_at, (df, delta_records))}
+    return {}
+
+
+def cached_result(settings):
+    stored = get_results().get(settings)
+    if stored is not None and time.time() - stored[0] < PAGE_CACHE_TTL:
+        return stored[1]
+    return None
+
+
+def store_result(settings, result):
+    results = get_results()
+    now = time.time()
+    # Expired results are dropped here, so the dict only holds the last TTL's worth
+    for key in [k for k, (finished_at, _) in results.items() if now - finished_at >= PAGE_CACHE_TTL]:
+        results.pop(key, None)
+    results[settings] = (now, result)
+
+
+def run_scrape(url, scrape_all, workers, rate_limit, engine, track_changes, incremental, use_cache, resume,
+               dedupe, warm_browsers, lean, enrich, on_page=None):
+    # Not a st.cache_data function: on_page draws into elements created outside it,
+    # which Streamlit can't replay on a cache hit. The result is kept with get_results instead.
+    store = InventoryStore() if track_changes else None
+    cache = PageCache(ttl=PAGE_CACHE_TTL) if use_cache else None
+    drivers = {"driver_factory": partial(create_driver, lean=lean)}
+    if warm_browsers:
+        pool = get_browser_pool(lean)
+        drivers = {"driver_factory": pool.acquire, "driver_release": pool.release}
+    df = None
+    try:
+        for event in iter_scrape(url=url, scrape_all=scrape_all, workers=workers, rate_limit=rate_limit,
+                                 engine=engine, store=store, incremental=incremental, cache=cache,
+                                 resume=resume, dedupe=dedupe, enrich=enrich, **drivers):
+            if event["type"] == "done":
+                df = event["df"]
+            elif on_page is not None:
+                on_page(event)
+        delta_records = store.delta_records(df.attrs["delta"]["run_id"]) if df is not None and "delta" in df.attrs else []
+    finally:
+        if store is not None:
+            store.close()
+    return df, delta_records
+
+
+class LiveProgress:
+    # Progress bar, running count and the latest vehicles, updated page by page.
+    # Only a raw preview: the typed table is built once, when the scrape is done.
+    def __init__(self, scrape_all):
+        self.scrape_all = scrape_all
+        self.bar = st.progress(0.0, text="Starting... (a browser may open to get past security checks)")
+        self.table = st.empty()
+        self.vehicles = deque(maxlen=LIVE_PREVIEW_ROWS)
+
+    def __call__(self, event):
+        self.vehicles.extend(event["vehicles"])
+        text = f"Page {event['page_index'] + 1} done ({event['source']}), {event['total']} vehicles so far"
+        # The page count is unknown until an empty page shows up, so the bar only approaches the end
+        pages = event["pages"]
+        self.bar.progress(pages / (pages + 1) if self.scrape_all else 1.0, text=text)
+        self.table.dataframe(pd.DataFrame(list(self.vehicles)), use_container_width=True)
+
+    def finish(self):
+        self.bar.empty()
+        self.table.empty()
+
 
 if st.button("Start Scraping", type="primary"):
-    with st.spinner('Scraping in progress... this opens a browser visually to bypass security...'):
+    settings = (url, scrape_all, int(workers), rate_limit, "http" if fast_mode else "browser",
+                track_changes, incremental, use_cache, resume, dedupe, warm_browsers, lean, enrich)
+    # Pressing the button again with the same settings reuses the last result instead of launching Chrome again
+    result = cached_result(settings) if use_cache else None
+    live = LiveProgress(scrape_all) if result is None else None
+    try:
+        if result is None:
+            result = run_scrape(*settings, on_page=live)
+            if result[0] is not None:
+                store_result(settings, result)
+        # The result is kept in the session so widget changes don't lose it
+        st.session_state["scrape_result"] = result
+    except Exception as e:
+        st.session_state.pop("scrape_result", None)
+        st.error(f"An error occurred: {e}")
+    finally:
+        if live is not None:
+            live.finish()
+
+if "scrape_result" in st.session_state:
+    df, delta_records = st.session_state["scrape_result"]
+    
+    if df is not None and not df.empty:
+        duplicates = df.attrs.get("metrics", {}).get("counters", {}).get("duplicates", 0)
+        st.success(f"✅ Successfully scraped {len(df)} vehicles!"
+                   + (f" ({duplicates} duplicates listed on several pages removed)" if duplicates else ""))
+        
+        # Metrics
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Total Vehicles", len(df))
+        
+        # Check for price columns for metrics
+        # Prices are already numeric (typed schema), missing ones are skipped
+        avg_price = df['Final Price'].mean() if 'Final Price' in df.columns else None
+        col2.metric("Average Price", f"${avg_price:,.0f}" if pd.notna(avg_price) else "N/A")
+        
+        col3.metric("Models Found", df['Model'].nunique() if 'Model' in df.columns else "N/A")
+
+        # Changes since the last run
+        if "delta" in df.attrs:
+            delta = df.attrs["delta"]
+            d1, d2, d3 = st.columns(3)
+            d1.metric("New Since Last Run", delta["added"])
+            d2.metric("Removed", delta["removed"] if delta["complete"] else "n/a")
+            d3.metric("Price Changes", delta["price_changed"])
+
+        # Display Data
+        st.dataframe(df, use_container_width=True)
+
+        # Where the time went, page by page
+        if df.attrs.get("metrics"):
+            with st.expander("📈 Run metrics"):
+                st.dataframe(pd.DataFrame(summary_rows(df.attrs["metrics"])), hide_index=True, use_container_width=True)
+        if df.attrs.get("page_timings"):
+            with st.expander("⏱️ Page timings"):
+                st.dataframe(pd.DataFrame(df.attrs["page_timings"]), use_container_width=True)
+        
+        # Convert to CSV for download
+        csv = df.to_csv(index=False).encode('utf-8')
+        
+        dl1, dl2 = st.columns(2)
+        dl1.download_button(
+            label="📥 Download CSV",
+            data=csv,
+            file_name='inventory.csv',
+            mime='text/csv',
+        )
+
+        # Typed columnar copy: smaller, and loads with the right types in pandas/Arrow
         try:
-            # Run the scraper
-            df = scrape_cartown(url=url, scrape_all=scrape_all)
-            
-            if df is not None and not df.empty:
-                st.success(f"✅ Successfully scraped {len(df)} vehicles!")
-                
-                # Metrics
-                col1, col2, col3 = st.columns(3)
-                col1.metric("Total Vehicles", len(df))
-                
-                # Check for price columns for metrics
-                if 'Final Price' in df.columns:
-                    try:
-                        # Clean price for calculation (remove $, etc)
-                        avg_price = df['Final Price'].replace(r'[\$,]', '', regex=True).astype(float).mean()
-                        col2.metric("Average Price", f"${avg_price:,.0f}")
-                    except:
-                        col2.metric("Average Price", "N/A")
-                
-                col3.metric("Models Found", df['Model'].nunique() if 'Model' in df.columns else "N/A")
-
-                # Display Data
-                st.dataframe(df, use_container_width=True)
-                
-                # Convert to CSV for download
-                csv = df.to_csv(index=False).encode('utf-8')
-                
-                st.download_button(
-                    label="📥 Download CSV",
-                    data=csv,
-                    file_name='inventory.csv',
-                    mime='text/csv',
-                )
-            else:
-                st.error("❌ No vehicles found. Check the browser window for issues.")
-                
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
+            parquet_buffer = io.BytesIO()
+            write_typed(df, parquet_buffer)
+            dl2.download_button(
+                label="📥 Download Parquet",
+                data=parquet_buffer.getvalue(),
+                file_name='inventory.parquet',
+                mime='application/octet-stream',
+            )
+        except ImportError:
+            pass
+
+        if delta_records:
+            st.download_button(
+                label="📥 Download Changes Only",
+                data=pd.DataFrame(delta_records).to_csv(index=False).encode('utf-8'),
+                file_name='inventory_delta.csv',
+                mime='text/csv',
+            )
+    else:
+        st.error("❌ No vehicles found. Check the browser window for issues.")
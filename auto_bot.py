@@ -1,34 +1,53 @@
-import subprocess
 import os
-import pandas as pd
-import json
 import time
 import shutil
 from datetime import datetime
+from inventory_store import InventoryStore
+from metrics import RunMetrics
+from sf_runner import CrawlRunner, ShardedCrawl, build_command, find_reports, parse_progress, SF_PATH, DEFAULT_TIMEOUT
 
 # --- CONFIGURATION ---
-SF_PATH = r"C:\Program Files (x86)\Screaming Frog SEO Spider\ScreamingFrogSEOSpider.exe"
+# SF_PATH comes from sf_runner (set the SF_PATH environment variable to override it)
+SF_TIMEOUT = DEFAULT_TIMEOUT  # Seconds before a hung crawl is killed
+SF_SHARDS = 1  # Screaming Frog instances run at once, each on a slice of the URL list (needs RAM per instance)
 # Default is New Vehicles, but user can override at runtime
 DEFAULT_URL = "https://www.cartownlexington.com/new-vehicles/"
-MAX_PAGES = 30  # Covers ~600 cars
+MAX_PAGES = 30  # Covers ~600 cars; upper bound when DISCOVER_PAGES is on
+DISCOVER_PAGES = True  # Probe the site for its real page count instead of always crawling MAX_PAGES
 OUTPUT_DIR = os.path.join(os.getcwd(), "auto_crawl_data")
 URL_LIST_FILE = os.path.join(os.getcwd(), "urls_to_crawl.txt")
+STREAM_THRESHOLD_MB = 100  # Reports bigger than this are converted chunk by chunk
+OUTPUT_FORMAT = "csv"  # "csv" or "parquet" (typed columns: numeric prices, categorical colors)
+DEDUPE_POLICY = "first"  # Repeated VIN / stock number: "first", "latest" or "merge" (fields combined); None keeps all
+ENRICH_DETAILS = False  # Also visit every vehicle's detail page for the fields reports lack (bulk mode only)
+TRACK_CHANGES = True  # Keep a local VIN-keyed store and write a delta file per run
+STORE_PATH = os.path.join(os.getcwd(), "inventory_store.db")
+
+def generate_url_list(base_url, discover=DISCOVER_PAGES, metrics=None):
+    # Imported per step (here, clean_data) so the prompt comes up without loading requests / pandas
+    from page_discovery import discover_page_count, pagination_urls
 
-def generate_url_list(base_url):
-    print(f"Generating URL list for {MAX_PAGES} pages...")
     print(f"Base Source: {base_url}")
+    page_count = MAX_PAGES
+    if discover:
+        print(f"Discovering page count (up to {MAX_PAGES})...")
+        start = time.monotonic()
+        page_count, method = discover_page_count(base_url, max_pages=MAX_PAGES)
+        print(f"Found {page_count} pages ({method}).")
+        if metrics is not None:
+            metrics.add_time("discovery", time.monotonic() - start)
+            metrics.set("discovery_method", method)
+    if metrics is not None:
+        metrics.set("pages", page_count)
+    print(f"Generating URL list for {page_count} pages...")
     
     with open(URL_LIST_FILE, "w") as f:
         # Pagination URLs
-        for i in range(MAX_PAGES):
-            if "?" in base_url:
-                url = f"{base_url}&_p={i}"
-            else:
-                url = f"{base_url}?_p={i}" 
+        for url in pagination_urls(base_url, page_count):
             f.write(url + "\n")
     print(f"Saved generated URLs to {URL_LIST_FILE}")
 
-def run_screaming_frog():
+def run_screaming_frog(shards=SF_SHARDS, metrics=None):
     if not os.path.exists(SF_PATH):
         print(f"ERROR: Screaming Frog not found at {SF_PATH}")
         return False
@@ -37,8 +56,8 @@ def run_screaming_frog():
     if os.path.exists(OUTPUT_DIR):
         try:
             shutil.rmtree(OUTPUT_DIR)
-        except:
-            pass
+        except OSError as e:
+            print(f"Could not clear {OUTPUT_DIR} ({e}), old reports may be mixed in.")
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
 
@@ -46,96 +65,155 @@ def run_screaming_frog():
     print("This may take a minute or two. Please wait...")
 
     # Command: Run list mode, headless, export custom extraction to folder
-    cmd = [
-        SF_PATH,
-        "--list-mode", URL_LIST_FILE, 
-        "--headless",
-        "--output-folder", OUTPUT_DIR,
-        "--export-custom-extraction" 
-    ]
-    
+    if shards > 1:
+        print(f"Splitting the URL list over {shards} Screaming Frog instances...")
+        runner = ShardedCrawl(URL_LIST_FILE, OUTPUT_DIR, shards, timeout=SF_TIMEOUT, sf_path=SF_PATH)
+    else:
+        runner = CrawlRunner(build_command(URL_LIST_FILE, OUTPUT_DIR, SF_PATH), timeout=SF_TIMEOUT,
+                             log_path=os.path.join(OUTPUT_DIR, "screaming_frog.log"))
+
+    def show(lines, runner):
+        for line in lines:
+            print(f"  {line}")
+        if any(parse_progress(line) for line in lines):
+            print(f"  >> {runner.progress_text()}")
+
     try:
-        subprocess.run(cmd, check=True)
-        print("Crawl complete!")
-        return True
-    except subprocess.CalledProcessError as e:
+        runner.start()
+    except OSError as e:
         print(f"Error running Screaming Frog: {e}")
         return False
+    status = runner.wait(on_lines=show)
+    if metrics is not None:
+        metrics.add_time("crawl", runner.elapsed)
+        metrics.count("urls_crawled", runner.progress.get("completed", 0))
+        metrics.set("crawl_status", status)
+        metrics.set("shards", shards)
+
+    if status == "ok":
+        print(f"Crawl complete! ({runner.summary()})")
+        return True
+    print(f"Error running Screaming Frog: {runner.summary()} (exit code {runner.returncode})")
+    return False
+
+def track_changes(vehicle_batches, source, timestamp):
+    # Upsert the run into the local store and export what changed since last time
+    store = InventoryStore(STORE_PATH)
+    try:
+        run_id = store.begin_run(source)
+        for batch in vehicle_batches:
+            store.upsert(run_id, source, batch)
+        delta = store.finish_run(run_id, source, complete=True)
+        print(f"Changes since last run: {delta['added']} added, {delta['removed']} removed, "
+              f"{delta['price_changed']} price changes.")
+
+        delta_filename = f"Inventory_Delta_{timestamp}.csv"
+        if store.export_delta(run_id, delta_filename):
+            print(f"Saved changes to: {os.path.abspath(delta_filename)}")
+        return delta
+    finally:
+        store.close()
+
+def clean_data(stream=None, source=DEFAULT_URL, metrics=None):
+    # metrics: RunMetrics of the whole run, saved next to the final file
+    from vehicle_json import extract_reports, format_stats, summarize_stats, vehicles_to_dataframe, stream_convert, iter_output_records
+    from inventory_schema import write_table
 
-def clean_data():
     print("\n--- Processing Data ---")
+    metrics = metrics or RunMetrics("auto_bot")
     
     if not os.path.exists(OUTPUT_DIR):
         return
 
-    # Find the exported CSV in the output directory
-    exported_files = [f for f in os.listdir(OUTPUT_DIR) if f.endswith(".csv") and "custom_extraction" in f.lower()]
+    # Find the exported CSVs in the output directory (one per shard in sharded mode)
+    report_paths = find_reports(OUTPUT_DIR)
     
-    if not exported_files:
+    if not report_paths:
         print("No extraction report found. Did the crawl finish successfully?")
         return
 
-    csv_path = os.path.join(OUTPUT_DIR, exported_files[0])
-    print(f"Processing report: {exported_files[0]}")
+    for path in report_paths:
+        print(f"Processing report: {os.path.relpath(path, OUTPUT_DIR)}")
+    metrics.count("reports", len(report_paths))
     
+    # Save Final w/ Timestamp
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
+    final_filename = f"Inventory_Final_{timestamp}.{OUTPUT_FORMAT}"
+
+    # Large reports are streamed so memory stays flat
+    if stream is None:
+        stream = sum(os.path.getsize(path) for path in report_paths) > STREAM_THRESHOLD_MB * 1024 * 1024
+
     try:
-        # Read properly handling potential encoding issues
-        try:
-            df = pd.read_csv(csv_path)
-        except UnicodeDecodeError:
-            df = pd.read_csv(csv_path, encoding='latin1')
+        if stream:
+            print("Using streaming mode (chunked read)...")
+            # Read, parse and write happen interleaved here, so they share one timer
+            with metrics.timer("stream_convert"):
+                result = stream_convert(
+                    report_paths, final_filename,
+                    progress=lambda e: print(f"  Chunk {e['chunk']} ({e['fraction']:.0%} read): {e['total']} vehicles so far"),
+                    dedupe=DEDUPE_POLICY
+                )
+            metrics.add_counts(summarize_stats(result["stats"]), prefix="json_")
+            metrics.count("duplicates", result["duplicates"])
+            for line in format_stats(result["stats"]):
+                print(f"  {line}")
+            if result["duplicates"]:
+                print(f"  Dropped {result['duplicates']} duplicate vehicles.")
+
+            if not result["vehicles"]:
+                print("No vehicles extracted.")
+                return
+            vehicle_count = result["vehicles"]
+        else:
+            # Parse every report in bulk and merge them, collapsing repeated VINs
+            with metrics.timer("read_parse"):
+                all_vehicles, stats, duplicates = extract_reports(report_paths, dedupe=DEDUPE_POLICY)
+            metrics.add_counts(summarize_stats(stats), prefix="json_")
+            metrics.count("duplicates", duplicates)
+            for line in format_stats(stats):
+                print(f"  {line}")
+            if duplicates:
+                print(f"  Dropped {duplicates} duplicate vehicles.")
+
+            if not all_vehicles:
+                print("No vehicles extracted.")
+                return
+
+            if ENRICH_DETAILS:
+                from enrich import detail_cache, enrich_vehicles
+                with metrics.timer("enrich"):
+                    enrich_vehicles(all_vehicles, source, cache=detail_cache(), metrics=metrics)
+
+            # Create Clean DF (priority columns first)
+            with metrics.timer("dataframe"):
+                clean_df = vehicles_to_dataframe(all_vehicles)
+            with metrics.timer("write"):
+                write_table(clean_df, final_filename)
+            vehicle_count = len(clean_df)
 
-        # Identify JSON columns
-        json_cols = [col for col in df.columns if df[col].astype(str).str.contains('{"', regex=False).any()]
-        
-        all_vehicles = []
-        for index, row in df.iterrows():
-            for col in json_cols:
-                val = row[col]
-                if pd.isna(val): continue
-                val = str(val).strip()
-                if val.startswith("{") and val.endswith("}"):
-                    try:
-                        data = json.loads(val)
-                        all_vehicles.append(data)
-                    except:
-                        try:
-                            # Attempt fix for CSV double-quote escaping
-                            data = json.loads(val.replace('""', '"'))
-                            all_vehicles.append(data)
-                        except:
-                            pass
-
-        if not all_vehicles:
-            print("No vehicles extracted.")
-            return
-
-        # Create Clean DF
-        clean_df = pd.DataFrame(all_vehicles)
-        
-        # Sort Columns
-        priority = ['vin', 'stock', 'year', 'make', 'model', 'trim', 'price', 'msrp', 'ext_color', 'int_color']
-        cols = clean_df.columns.tolist()
-        order = [c for c in priority if c in cols] + [c for c in cols if c not in priority]
-        clean_df = clean_df[order]
-        
-        # Save Final w/ Timestamp
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
-        final_filename = f"Inventory_Final_{timestamp}.csv"
-        
-        clean_df.to_csv(final_filename, index=False)
         print(f"\nSUCCESS! ✅")
-        print(f"Extracted {len(clean_df)} vehicles.")
+        print(f"Extracted {vehicle_count} vehicles.")
         print(f"Saved to: {os.path.abspath(final_filename)}")
+
+        metrics.count("vehicles", vehicle_count)
+        if TRACK_CHANGES:
+            batches = iter_output_records(final_filename) if stream else [all_vehicles]
+            with metrics.timer("store"):
+                track_changes(batches, source, timestamp)
         
-        # Attempt to open the file automatically
+        # Attempt to open the file automatically (Windows only)
         try:
             os.startfile(final_filename)
-        except:
+        except (AttributeError, OSError):
             pass
 
     except Exception as e:
         print(f"Error processing data: {e}")
+        metrics.set("error", str(e))
+    finally:
+        # Also written when nothing was extracted, to see where the rows went
+        print(f"Run metrics: {metrics.write(final_filename)}")
 
 if __name__ == "__main__":
     print("="*60)
@@ -149,9 +227,11 @@ if __name__ == "__main__":
     
     target_url = user_input if user_input else DEFAULT_URL
     
-    generate_url_list(target_url)
-    success = run_screaming_frog()
+    run_metrics = RunMetrics("auto_bot")
+    run_metrics.set("url", target_url)
+    generate_url_list(target_url, metrics=run_metrics)
+    success = run_screaming_frog(metrics=run_metrics)
     if success:
-        clean_data()
+        clean_data(source=target_url, metrics=run_metrics)
     
     print("\nRun complete.")
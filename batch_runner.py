@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from functools import partial
+from multiprocessing import Manager
+from throttle import domain_of
+
+# --- CONFIGURATION (defaults, every key can be set in the config file) ---
+DEFAULT_SETTINGS = {
+    "output": "Batch_Inventory_{timestamp}.csv",  # .csv, .parquet or .feather
+    "max_workers": 4,  # Sites scraped at the same time (processes)
+    "per_domain_limit": 1,  # Jobs allowed on the same domain at the same time
+    "retries": 2,  # Extra attempts per job after a failure
+    "backoff": 10,  # Seconds before the first retry, doubled every attempt
+    "track_changes": True,  # Record each job in the local inventory store
+    "checkpoint_dir": "batch_checkpoints",  # One resumable journal per job
+}
+
+# Scrape options applied to every job unless the site overrides them
+DEFAULT_SCRAPE = {
+    "scrape_all": True,
+    "engine": "http",
+    "workers": 2,
+    "rate_limit": 2.0,
+    "enrich": False,  # Also visit every vehicle's detail page (see enrich.py)
+}
+
+EXAMPLE_CONFIG = {
+    "output": "Batch_Inventory_{timestamp}.csv",
+    "max_workers": 4,
+    "per_domain_limit": 1,
+    "defaults": {"scrape_all": True, "engine": "http", "workers": 2, "rate_limit": 2.0},
+    "sites": [
+        {"site": "Car Town", "urls": ["https://www.cartownlexington.com/new-vehicles/",
+                                      "https://www.cartownlexington.com/used-vehicles/"]},
+        {"site": "Other Dealer", "urls": ["https://www.example-dealer.com/new-vehicles/"], "engine": "browser"},
+    ],
+}
+
+
+class ConfigError(ValueError):
+    pass
+
+
+def slugify(text):
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")
+
+
+def load_jobs(config):
+    # One job per (site, base url); site-level keys override the defaults
+    settings = dict(DEFAULT_SETTINGS)
+    settings.update({k: v for k, v in config.items() if k in DEFAULT_SETTINGS})
+    scrape_defaults = dict(DEFAULT_SCRAPE)
+    scrape_defaults.update(config.get("defaults", {}))
+
+    jobs = []
+    for position, site in enumerate(config.get("sites", []), 1):
+        # "urls": [...] or a single "url"
+        urls = [url for url in (site.get("urls") or [site.get("url")]) if url]
+        if not urls:
+            raise ConfigError(f"site #{position} ({site.get('site', 'unnamed')}) has no \"url\" or \"urls\"")
+        name = site.get("site") or domain_of(urls[0])
+        options = dict(scrape_defaults)
+        options.update({k: v for k, v in site.items() if k in DEFAULT_SCRAPE})
+        for url in urls:
+            jobs.append({
+                "index": len(jobs),
+                "site": name,
+                "url": url,
+                "options": options,
+                "checkpoint": os.path.join(settings["checkpoint_dir"], f"{slugify(name)}_{slugify(url)}.jsonl"),
+            })
+    return settings, jobs
+
+
+def run_job(job, domain_slots, retries, backoff):
+    # Runs in a worker process: scrape one base url, retrying with backoff
+    from scrape_inventory import scrape_cartown, create_driver
+
+    started = time.monotonic()
+    last_error = "no vehicles found"
+    with domain_slots[domain_of(job["url"])]:
+        for attempt in range(retries + 1):
+            if attempt:
+                delay = backoff * 2 ** (attempt - 1)
+                print(f"[{job['site']}] Retry {attempt}/{retries} for {job['url']} in {delay}s...")
+                time.sleep(delay)
+            try:
+                df = scrape_cartown(
+                    url=job["url"],
+                    driver_factory=partial(create_driver, headless=True),
+                    checkpoint=job["checkpoint"],
+                    resume=attempt > 0,
+                    save_backup=False,
+                    **job["options"],
+                )
+            except Exception as e:
+                last_error = str(e)
+                continue
+            if df is not None and not df.empty:
+                metrics = df.attrs.get("metrics")
+                # What the crawl actually covered, not what was asked for (failed pages, early stop)
+                complete = df.attrs.get("complete", False)
+                df.attrs = {}
+                return {"job": job, "ok": True, "attempts": attempt + 1, "df": df, "metrics": metrics,
+                        "complete": complete, "seconds": time.monotonic() - started}
+
+    return {"job": job, "ok": False, "attempts": retries + 1, "error": last_error, "df": None,
+            "seconds": time.monotonic() - started}
+
+
+def write_combined(frames, output_path):
+    import pandas as pd
+
+    from inventory_schema import write_table
+
+    combined = pd.concat(frames, ignore_index=True)
+    write_table(combined, output_path)
+    return combined
+
+
+def run_batch(config):
+    settings, jobs = load_jobs(config)
+    if not jobs:
+        print("No sites configured.")
+        return []
+
+    os.makedirs(settings["checkpoint_dir"], exist_ok=True)
+    print(f"Running {len(jobs)} jobs on up to {settings['max_workers']} processes...")
+
+    results = []
+    with Manager() as manager:
+        # Per-domain limits are shared semaphores, so they hold across processes
+        domain_slots = {d: manager.BoundedSemaphore(settings["per_domain_limit"])
+                        for d in {domain_of(job["url"]) for job in jobs}}
+        with ProcessPoolExecutor(max_workers=settings["max_workers"]) as pool:
+            futures = [pool.submit(run_job, job, domain_slots, settings["retries"], settings["backoff"])
+                       for job in jobs]
+            for future in as_completed(futures):
+                result = future.result()
+                job = result["job"]
+                if result["ok"]:
+                    print(f"✅ {job['site']} | {job['url']}: {len(result['df'])} vehicles "
+                          f"({result['attempts']} attempt(s), {result['seconds']:.0f}s)")
+                else:
+                    print(f"❌ {job['site']} | {job['url']}: failed after {result['attempts']} attempt(s): {result['error']}")
+                results.append(result)
+
+    # Keep the config order in the combined output
+    results.sort(key=lambda r: r["job"]["index"])
+
+    frames = []
+    for result in results:
+        if result["ok"]:
+            df = result["df"]
+            df.insert(0, "Source URL", result["job"]["url"])
+            df.insert(0, "Source Site", result["job"]["site"])
+            frames.append(df)
+
+    if frames:
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
+        output_path = settings["output"].format(timestamp=timestamp)
+        combined = write_combined(frames, output_path)
+        print(f"\nSaved {len(combined)} vehicles from {len(frames)} jobs to: {os.path.abspath(output_path)}")
+        print(f"Run metrics: {batch_metrics(results).write(output_path)}")
+
+    if settings["track_changes"]:
+        record_changes(results)
+
+    return results
+
+
+def batch_metrics(results):
+    # Job counters summed over the batch, plus one line per job
+    from metrics import RunMetrics
+
+    metrics = RunMetrics("batch")
+    jobs = []
+    for result in results:
+        job = result["job"]
+        metrics.count("jobs_ok" if result["ok"] else "jobs_failed")
+        metrics.count("attempts", result["attempts"])
+        metrics.add_time("job", result["seconds"])
+        job_metrics = result.get("metrics") or {}
+        metrics.add_counts(job_metrics.get("counters", {}))
+        for stage, timer in job_metrics.get("timers", {}).items():
+            metrics.add_time(stage, timer["total_s"])
+        jobs.append({"site": job["site"], "url": job["url"], "ok": result["ok"], "attempts": result["attempts"],
+                     "seconds": round(result["seconds"], 1), "error": result.get("error")})
+    metrics.set("jobs", jobs)
+    return metrics
+
+
+def record_changes(results):
+    import pandas as pd
+    from inventory_store import InventoryStore
+
+    store = InventoryStore()
+    try:
+        for result in results:
+            if not result["ok"]:
+                continue
+            # The scraper's output uses display names, the store wants the raw keys
+            raw = result["df"].rename(columns={"VIN": "vin", "Stock #": "stock", "Year": "year", "Make": "make",
+                                               "Model": "model", "Trim": "trim", "Final Price": "price",
+                                               "MSRP": "msrp"})
+            vehicles = [{k: v for k, v in row.items() if not (pd.api.types.is_scalar(v) and pd.isna(v))}
+                        for row in raw.to_dict("records")]
+            delta = store.record_run(vehicles, source=result["job"]["url"], complete=result["complete"])
+            print(f"  {result['job']['site']} | {result['job']['url']}: {delta['added']} added, "
+                  f"{delta['removed']} removed, {delta['price_changed']} price changes")
+    finally:
+        store.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scrape many dealer inventories in one unattended run.")
+    parser.add_argument("config", nargs="?", help="JSON file listing the sites and base URLs")
+    parser.add_argument("--output", help="Combined output file (.csv, .parquet or .feather)")
+    parser.add_argument("--max-workers", type=int, help="Jobs running at the same time")
+    parser.add_argument("--example-config", action="store_true", help="Print an example config and exit")
+    args = parser.parse_args(argv)
+
+    if args.example_config:
+        print(json.dumps(EXAMPLE_CONFIG, indent=4))
+        return 0
+    if not args.config:
+        parser.error("a config file is required (see --example-config)")
+
+    with open(args.config, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    if args.output:
+        config["output"] = args.output
+    if args.max_workers:
+        config["max_workers"] = args.max_workers
+
+    try:
+        results = run_batch(config)
+    except ConfigError as e:
+        parser.error(f"{args.config}: {e}")
+    # Non-zero exit code so schedulers notice failed jobs
+    return 0 if results and all(r["ok"] for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import FIXTURE_PAGES, load_fixture_page
+from html_extract import _EXTRACTORS, lxml
+
+REPEAT = 5
+
+
+def bench(engine, page):
+    extractor = _EXTRACTORS[engine]
+    best = float("inf")
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        values = extractor(page)
+        best = min(best, time.perf_counter() - start)
+    return best, len(values)
+
+
+def main():
+    engines = [e for e in _EXTRACTORS if e != "lxml" or lxml is not None]
+    print(f"{'page':<8} {'size':>8} " + " ".join(f"{e:>12}" for e in engines))
+    for name in FIXTURE_PAGES:
+        page = load_fixture_page(name)
+        row = []
+        expected = FIXTURE_PAGES[name][0]
+        for engine in engines:
+            seconds, count = bench(engine, page)
+            if count != expected:
+                print(f"WARNING: {engine} found {count} vehicles on {name}, expected {expected}")
+            row.append(f"{seconds * 1000:>10.1f}ms")
+        print(f"{name:<8} {len(page) / 1024:>6.0f}KB " + " ".join(row))
+    print(f"(best of {REPEAT} runs; 'soup' is the original full BeautifulSoup tree)")
+
+
+if __name__ == "__main__":
+    main()
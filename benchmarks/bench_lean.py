@@ -0,0 +1,56 @@
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from page_discovery import page_url
+from scrape_inventory import close_driver, create_driver, load_page, parse_page
+
+# Needs Chrome and network access: loads real inventory pages, once in a full
+# browser and once in a lean one, and compares what each page load cost.
+DEFAULT_URL = "https://www.cartownlexington.com/new-vehicles/"
+
+
+def run(url, pages, lean, headless):
+    # One timing record per page, from a fresh browser
+    driver = create_driver(headless=headless, lean=lean)
+    try:
+        # The first load may sit on a security check; it warms up the browser and is not counted
+        load_page(driver, url)
+        timings = []
+        for page_index in range(pages):
+            html, timing = load_page(driver, page_url(url, page_index))
+            parse_page(html, timing)
+            timings.append(timing)
+        return timings
+    finally:
+        close_driver(driver)
+
+
+def report(name, timings):
+    load = [t["nav_s"] + t["wait_s"] for t in timings]
+    sizes = [t["bytes"] for t in timings if "bytes" in t]
+    requests = [t["requests"] for t in timings if "requests" in t]
+    vehicles = sum(t["vehicles"] for t in timings)
+    kb = f"{sum(sizes) / len(sizes) / 1024:>9.0f}KB" if sizes else f"{'n/a':>11}"
+    reqs = f"{sum(requests) / len(requests):>9.0f}" if requests else f"{'n/a':>9}"
+    print(f"{name:<6} {sum(load) / len(load):>9.2f}s {max(load):>8.2f}s {kb} {reqs} {vehicles:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Page load time and bytes per page, full vs lean browser.")
+    parser.add_argument("url", nargs="?", default=DEFAULT_URL)
+    parser.add_argument("--pages", type=int, default=3, help="Inventory pages to load per mode")
+    parser.add_argument("--headless", action="store_true", help="Run the full browser headless too (same as lean)")
+    args = parser.parse_args(argv)
+
+    print(f"{'mode':<6} {'avg load':>10} {'max load':>9} {'avg size':>11} {'requests':>9} {'vehicles':>9}")
+    report("full", run(args.url, args.pages, lean=False, headless=args.headless))
+    report("lean", run(args.url, args.pages, lean=True, headless=None))
+    print("(size = transferSize from the Resource Timing API; cross-origin files without "
+          "Timing-Allow-Origin count 0, so both sizes are lower bounds)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_driver import FixtureDriver
+from fixtures import FIXTURE_PAGES, SF_EXPORTS, sf_export
+from records import VehicleColumns
+from scrape_inventory import scrape_cartown
+from vehicle_json import read_export, find_json_columns, extract_vehicles, vehicles_to_dataframe, stream_convert, summarize_stats
+
+BENCH_URL = "https://bench.example-dealer.com/new-vehicles/"
+
+
+def measure(fn):
+    # (result, seconds, peak MB). Timed on a plain run; the peak comes from a
+    # second run under tracemalloc, which would otherwise skew the timing.
+    start = time.perf_counter()
+    result = fn()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak / (1024 * 1024)
+
+
+def convert_bulk(path, processes=1):
+    # The non-streaming cleaning path, stage by stage
+    stages = {}
+    start = time.perf_counter()
+    df = read_export(path)
+    stages["read"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    json_cols = find_json_columns(df)
+    stages["detect"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vehicles, stats = extract_vehicles(df, json_cols, out=VehicleColumns(), processes=processes)
+    stages["parse"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    vehicles_to_dataframe(vehicles)
+    stages["frame"] = time.perf_counter() - start
+    return len(vehicles), summarize_stats(stats), stages
+
+
+def convert_stream(path):
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        result = stream_convert(path, os.path.join(tmp, "out.csv"))
+        return result["vehicles"], summarize_stats(result["stats"]), {"stream": time.perf_counter() - start}
+
+
+def scrape(pages, size, workers, nav_delay=0.0):
+    # Pages are generated up front so only the scraper is timed
+    for page_index in range(pages):
+        FixtureDriver.page(size, page_index)
+
+    def run():
+        # The scraper reports on stdout page by page; keep the table readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            df = scrape_cartown(url=BENCH_URL, scrape_all=True, workers=workers, rate_limit=0,
+                                driver_factory=lambda: FixtureDriver(pages, size, nav_delay), checkpoint=None,
+                                save_backup=False)
+            total = time.perf_counter() - start
+        timings = df.attrs["page_timings"]
+        stages = {key[:-2]: sum(t.get(key, 0.0) for t in timings) for key in ("nav_s", "wait_s", "parse_s")}
+        # Page stages overlap when workers > 1, "rest" is only meaningful for one worker
+        stages["rest"] = max(0.0, total - sum(stages.values()))
+        return len(df), None, stages
+    return run
+
+
+def report(name, expected, result, seconds, peak_mb):
+    count, totals, stages = result
+    stage_text = " | ".join(f"{k} {v:.2f}s" for k, v in stages.items())
+    print(f"{name:<24} {count:>8} {seconds:>8.2f}s {count / seconds:>10.0f}/s {peak_mb:>8.1f}MB  {stage_text}")
+    if count != expected:
+        print(f"WARNING: {name} found {count} vehicles, expected {expected}")
+    if totals is not None and not totals["fixed"]:
+        print(f"WARNING: {name} never used the doubled-quote fallback")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the scrape and Screaming Frog cleaning paths on fixtures.")
+    parser.add_argument("--exports", default="1k,10k", help=f"Export sizes to convert ({', '.join(SF_EXPORTS)})")
+    parser.add_argument("--pages", type=int, default=10, help="Inventory pages the fake driver serves")
+    parser.add_argument("--page-size", default="medium", choices=list(FIXTURE_PAGES))
+    parser.add_argument("--workers", default="1,4", help="Browser worker counts to scrape with")
+    parser.add_argument("--nav-delay", type=float, default=0.0,
+                        help="Seconds the fake browser takes per page load (simulates network time)")
+    parser.add_argument("--processes", default="1", help="Parse process counts for the bulk conversion, e.g. 1,4,16")
+    args = parser.parse_args(argv)
+
+    print(f"{'benchmark':<24} {'vehicles':>8} {'time':>9} {'throughput':>12} {'peak':>10}  stages")
+    for name in [n for n in args.exports.split(",") if n]:
+        path, expected = sf_export(name)
+        for processes in [int(p) for p in args.processes.split(",") if p]:
+            result, seconds, peak_mb = measure(lambda: convert_bulk(path, processes))
+            report(f"sf {name} bulk" + (f" p{processes}" if processes > 1 else ""), expected, result, seconds, peak_mb)
+        result, seconds, peak_mb = measure(lambda: convert_stream(path))
+        report(f"sf {name} stream", expected, result, seconds, peak_mb)
+
+    expected = args.pages * FIXTURE_PAGES[args.page_size][0]
+    for workers in [int(w) for w in args.workers.split(",") if w]:
+        result, seconds, peak_mb = measure(scrape(args.pages, args.page_size, workers, args.nav_delay))
+        report(f"scrape {args.page_size} x{args.pages} w{workers}", expected, result, seconds, peak_mb)
+    print("(peak = Python heap of this process under tracemalloc, parse workers not included; "
+          "scrape stages are summed over pages)")
+
+
+if __name__ == "__main__":
+    main()
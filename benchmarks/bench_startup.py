@@ -0,0 +1,54 @@
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What each entry point loads before it does anything
+ENTRY_POINTS = ["auto_bot", "extract_json", "batch_runner", "scrape_inventory", "sf_runner"]
+# Heavy packages worth calling out when an entry point pulls them in
+HEAVY = ["seleniumbase", "pandas", "numpy", "pyarrow", "tkinter", "requests", "bs4", "lxml"]
+REPEAT = 3
+
+
+def import_times(module):
+    # {module: cumulative microseconds} from one cold `python -X importtime -c "import module"`
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                          cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr.strip().splitlines()[-1]}")
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module):
+    # Best of REPEAT runs for the total; the heavy packages from that run
+    best = None
+    for _ in range(REPEAT):
+        times = import_times(module)
+        if best is None or times[module] < best[module]:
+            best = times
+    return best[module] / 1000, [name for name in HEAVY if name in best]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import time of the entry points (python -X importtime).")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    args = parser.parse_args(argv)
+
+    print(f"{'module':<18} {'import':>9}  heavy packages loaded")
+    for module in args.modules:
+        ms, heavy = measure(module)
+        print(f"{module:<18} {ms:>7.0f}ms  {', '.join(heavy) or '-'}")
+    print(f"(best of {REPEAT} cold interpreter starts; details: python -X importtime -c \"import <module>\")")
+
+
+if __name__ == "__main__":
+    main()
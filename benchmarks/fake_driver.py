@@ -0,0 +1,54 @@
+import re
+import time
+from fixtures import FIXTURE_PAGES, make_inventory_page
+
+
+class FixtureDriver:
+    """Stands in for the seleniumbase Driver: serves generated inventory pages, no Chrome.
+
+    Pages _p=0 .. pages-1 hold vehicles (a different seed per page, so VINs
+    don't repeat); anything past that is an empty results page. nav_delay
+    simulates the network/render time of a real page load.
+    """
+
+    _cache = {}
+
+    def __init__(self, pages=10, size="medium", nav_delay=0.0):
+        self.pages = pages
+        self.size = size
+        self.nav_delay = nav_delay
+        self.page_source = ""
+        self.visited = []
+
+    @classmethod
+    def page(cls, size, page_index):
+        key = (size, page_index)
+        if key not in cls._cache:
+            count, padding_kb = FIXTURE_PAGES[size]
+            cls._cache[key] = make_inventory_page(count, padding_kb, seed=1000 + page_index)
+        return cls._cache[key]
+
+    def get(self, url):
+        match = re.search(r"[?&]_p=(\d+)", url)
+        page_index = int(match.group(1)) if match else 0
+        self.visited.append(page_index)
+        if self.nav_delay:
+            time.sleep(self.nav_delay)
+        if page_index < self.pages:
+            self.page_source = self.page(self.size, page_index)
+        else:
+            self.page_source = '<html><body><div class="no-results">No vehicles match</div></body></html>'
+
+    def execute_script(self, script):
+        # Only the page state probe, the transfer size probe and navigator.userAgent are ever asked for
+        if "userAgent" in script:
+            return "FixtureDriver"
+        if "transferSize" in script:
+            return [len(self.page_source), 1]
+        return "vehicles" if "data-vehicle" in self.page_source else "no_results"
+
+    def get_cookies(self):
+        return []
+
+    def quit(self):
+        pass
@@ -0,0 +1,169 @@
+import csv
+import gzip
+import html
+import json
+import os
+import random
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+# Screaming Frog exports are generated on first use (the 100k one is ~150 MB), not committed
+GENERATED_DIR = os.path.join(FIXTURE_DIR, "generated")
+
+# name: (vehicles on the page, KB of extra markup/scripts around them)
+FIXTURE_PAGES = {
+    "small": (12, 40),
+    "medium": (24, 600),
+    "large": (48, 1800),
+}
+
+# name: rows in a synthetic Screaming Frog custom extraction export
+SF_EXPORTS = {
+    "1k": 1000,
+    "10k": 10000,
+    "100k": 100000,
+}
+SF_JSON_COLUMNS = 3  # "Vehicle Data 1..3", like an extraction with three selectors
+SF_DOUBLED_QUOTES = 0.02  # Share of cells exported with doubled quotes (the "fixed" parse path)
+SF_EMPTY_CELLS = 0.1  # Share of empty extraction cells
+
+MAKES = {
+    "Toyota": ["Camry", "Corolla", "RAV4", "Tacoma", "Highlander"],
+    "Honda": ["Civic", "Accord", "CR-V", "Pilot"],
+    "Ford": ["F-150", "Escape", "Explorer", "Mustang"],
+    "Chevrolet": ["Silverado 1500", "Equinox", "Malibu", "Tahoe"],
+}
+TRIMS = ["Base", "LE", "SE", "XLE", "Sport", "Limited", "Touring"]
+COLORS = ["Black", "White", "Silver", "Gray", "Red", "Blue", "Celestial Silver Metallic"]
+INTERIORS = ["Black", "Gray", "Ash", "Beige"]
+
+
+def make_vehicle(rng, index):
+    make = rng.choice(list(MAKES))
+    msrp = rng.randrange(22000, 68000, 5)
+    return {
+        "vin": "".join(rng.choice("ABCDEFGHJKLMNPRSTUVWXYZ0123456789") for _ in range(17)),
+        "stock": f"T{index:05d}",
+        "year": rng.choice([2023, 2024, 2025]),
+        "make": make,
+        "model": rng.choice(MAKES[make]),
+        "trim": rng.choice(TRIMS),
+        "price": msrp - rng.randrange(0, 3000, 50),
+        "msrp": msrp,
+        "ext_color": rng.choice(COLORS),
+        "int_color": rng.choice(INTERIORS),
+        "body": rng.choice(["Sedan", "SUV", "Truck", "Coupe"]),
+        "drivetrain": rng.choice(["FWD", "AWD", "4WD", "RWD"]),
+        "mileage": rng.randrange(0, 40),
+        "url": f"/inventory/new-{make.lower()}-{index}/",
+    }
+
+
+def make_vehicle_card(vehicle):
+    # Roughly what a dealer result card looks like: attribute JSON, photos, specs, buttons
+    photos = "".join(
+        f'<img loading="lazy" src="https://images.example.com/{vehicle["vin"]}/{i}.jpg" alt="photo {i}">'
+        for i in range(6)
+    )
+    specs = "".join(f'<li class="spec"><span class="label">{k}</span><span class="value">{v}</span></li>'
+                    for k, v in vehicle.items())
+    return (
+        f'<div class="result-wrap new-vehicle" data-vehicle="{html.escape(json.dumps(vehicle))}">'
+        f'<div class="photo-carousel">{photos}</div>'
+        f'<h3 class="title"><a href="{vehicle["url"]}">{vehicle["year"]} {vehicle["make"]} {vehicle["model"]}</a></h3>'
+        f'<ul class="specs">{specs}</ul>'
+        f'<div class="pricing"><span class="msrp">${vehicle["msrp"]:,}</span>'
+        f'<span class="final-price">${vehicle["price"]:,}</span></div>'
+        '<button class="btn btn-primary">Confirm Availability</button>'
+        '</div>'
+    )
+
+
+def make_padding(rng, kilobytes):
+    # Inline scripts, tracking pixels and menu markup that real pages ship with
+    blocks = []
+    size = 0
+    while size < kilobytes * 1024:
+        words = " ".join(rng.choice(["var", "dealer", "config", "track", "menu", "item", "0x1f", "true"])
+                         for _ in range(200))
+        block = (f'<script type="text/javascript">window.__cfg_{len(blocks)} = "{words}";</script>'
+                 f'<nav class="mega-menu"><ul>' + "".join(f'<li><a href="/p/{i}">{i}</a></li>' for i in range(40))
+                 + '</ul></nav>')
+        blocks.append(block)
+        size += len(block)
+    return blocks
+
+
+def make_inventory_page(vehicle_count, padding_kb, seed=0):
+    rng = random.Random(seed)
+    vehicles = [make_vehicle(rng, i) for i in range(vehicle_count)]
+    cards = "".join(make_vehicle_card(v) for v in vehicles)
+    # Split between whole blocks so no <script> is left open around the cards
+    padding = make_padding(rng, padding_kb)
+    half = len(padding) // 2
+    return (
+        '<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>New Vehicles | Dealer</title>'
+        f'{"".join(padding[:half])}</head><body><header class="site-header"></header>'
+        f'<main><div class="results">{cards}</div></main>'
+        f'<footer>{"".join(padding[half:])}</footer></body></html>'
+    )
+
+
+def make_sf_export(path, rows, json_columns=SF_JSON_COLUMNS, seed=0):
+    # Columns as in a real export: address, status, then one column per extraction selector.
+    # The csv module applies the normal CSV double-quote escaping to the JSON cells.
+    rng = random.Random(seed)
+    header = ["Address", "Status Code", "Status"] + [f"Vehicle Data {i + 1}" for i in range(json_columns)]
+    expected = 0
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in range(rows):
+            cells = []
+            for col in range(json_columns):
+                if rng.random() < SF_EMPTY_CELLS:
+                    cells.append("")
+                    continue
+                text = json.dumps(make_vehicle(rng, row * json_columns + col))
+                if rng.random() < SF_DOUBLED_QUOTES:
+                    text = text.replace('"', '""')
+                cells.append(text)
+                expected += 1
+            writer.writerow([f"https://www.example-dealer.com/new-vehicles/?_p={row}", 200, "OK"] + cells)
+    return expected
+
+
+def sf_export(name):
+    # (path, vehicles in it) for a synthetic export, generated the first time it is asked for
+    path = os.path.join(GENERATED_DIR, f"sf_export_{name}.csv")
+    count_path = path + ".count"
+    if not (os.path.exists(path) and os.path.exists(count_path)):
+        os.makedirs(GENERATED_DIR, exist_ok=True)
+        expected = make_sf_export(path + ".tmp", SF_EXPORTS[name])
+        os.replace(path + ".tmp", path)
+        with open(count_path, "w") as f:
+            f.write(str(expected))
+    with open(count_path) as f:
+        return path, int(f.read())
+
+
+def fixture_path(name):
+    return os.path.join(FIXTURE_DIR, f"inventory_{name}.html.gz")
+
+
+def write_fixture_pages():
+    os.makedirs(FIXTURE_DIR, exist_ok=True)
+    for seed, (name, (count, padding_kb)) in enumerate(FIXTURE_PAGES.items()):
+        page = make_inventory_page(count, padding_kb, seed=seed)
+        # mtime=0 keeps the files byte-identical between regenerations
+        with gzip.GzipFile(fixture_path(name), "wb", mtime=0) as f:
+            f.write(page.encode("utf-8"))
+        print(f"Wrote {fixture_path(name)} ({len(page) / 1024:.0f} KB, {count} vehicles)")
+
+
+def load_fixture_page(name):
+    with gzip.open(fixture_path(name), "rt", encoding="utf-8") as f:
+        return f.read()
+
+
+if __name__ == "__main__":
+    write_fixture_pages()
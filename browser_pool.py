@@ -0,0 +1,153 @@
+import atexit
+import threading
+import time
+
+POOL_SIZE = 2  # Warm browsers kept between runs; extra ones a scrape needs are closed afterwards
+MAX_PAGES_PER_DRIVER = 150  # Chrome gets slow and memory hungry over time; recycled after this
+MAX_DRIVER_AGE = 60 * 60  # Seconds before a driver is recycled regardless
+
+
+class PooledDriver:
+    """A pooled browser: behaves like the driver itself, but counts page loads and crashes."""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.started_at = time.monotonic()
+        self.broken = False
+
+    def get(self, url):
+        self.pages += 1
+        try:
+            return self.driver.get(url)
+        except Exception:
+            self.broken = True
+            raise
+
+    def quit(self):
+        self.driver.quit()
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+
+def _cdp_cookies(cookies):
+    # Selenium cookie dicts -> Network.setCookies parameters
+    converted = []
+    for cookie in cookies:
+        item = {k: cookie[k] for k in ("name", "value", "domain", "path", "secure", "httpOnly") if k in cookie}
+        if "expiry" in cookie:
+            item["expires"] = cookie["expiry"]
+        if cookie.get("sameSite") in ("Strict", "Lax", "None"):
+            item["sameSite"] = cookie["sameSite"]
+        converted.append(item)
+    return converted
+
+
+class BrowserPool:
+    """Warm browsers shared by every scrape of this process (see app.py's st.cache_resource).
+
+    acquire() hands out an idle browser or starts a new one; release() keeps
+    up to size of them open for the next scrape and quits the rest. Browsers are
+    health-checked before reuse and replaced after max_pages page loads,
+    max_age seconds or a crash. Cookies (e.g. a cleared Cloudflare check) are
+    saved when a browser is returned and copied into every new one.
+
+    Use pool.acquire / pool.release as scrape_cartown's driver_factory /
+    driver_release.
+    """
+
+    def __init__(self, factory=None, size=POOL_SIZE, max_pages=MAX_PAGES_PER_DRIVER, max_age=MAX_DRIVER_AGE):
+        if factory is None:
+            from scrape_inventory import create_driver
+            factory = create_driver
+        self.factory = factory
+        self.size = size
+        self.max_pages = max_pages
+        self.max_age = max_age
+        self.cookies = {}  # (domain, name, path) -> cookie
+        self.stats = {"started": 0, "reused": 0, "closed": 0}
+        self._idle = []
+        self._closed = False
+        self._lock = threading.Lock()
+        atexit.register(self.close)
+
+    def acquire(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Browser pool is closed")
+            driver = self._idle.pop() if self._idle else None
+
+        # Health check and start-up happen outside the lock, they can take seconds
+        if driver is not None:
+            if self._healthy(driver):
+                self.stats["reused"] += 1
+                return driver
+            self._retire(driver)
+        return self._start()
+
+    def release(self, driver):
+        self._save_cookies(driver)
+        if self._healthy(driver):
+            with self._lock:
+                if not self._closed and len(self._idle) < self.size:
+                    self._idle.append(driver)
+                    return
+        self._retire(driver)
+
+    def _start(self):
+        print("Starting a warm browser for the pool...")
+        driver = PooledDriver(self.factory())
+        self.stats["started"] += 1
+        if self.cookies:
+            try:
+                driver.execute_cdp_cmd("Network.enable", {})
+                driver.execute_cdp_cmd("Network.setCookies", {"cookies": _cdp_cookies(self.cookies.values())})
+            except Exception as e:
+                print(f"Could not copy cookies into the new browser: {e}")
+        return driver
+
+    def _healthy(self, driver):
+        if driver.broken or driver.pages >= self.max_pages:
+            return False
+        if time.monotonic() - driver.started_at >= self.max_age:
+            return False
+        try:
+            return driver.execute_script("return 1") == 1 and bool(driver.window_handles)
+        except Exception:
+            return False
+
+    def _save_cookies(self, driver):
+        try:
+            cookies = driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", [])
+            cookies = [dict(c, expiry=int(c["expires"])) if c.get("expires", -1) > 0 else c for c in cookies]
+        except Exception:
+            try:
+                cookies = driver.get_cookies()
+            except Exception:
+                return
+        with self._lock:
+            for cookie in cookies:
+                self.cookies[(cookie.get("domain"), cookie.get("name"), cookie.get("path", "/"))] = cookie
+
+    def _retire(self, driver):
+        self.stats["closed"] += 1
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"Could not close a retired browser cleanly: {e}")
+
+    def idle_count(self):
+        with self._lock:
+            return len(self._idle)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for driver in idle:
+            try:
+                driver.quit()
+            except Exception:
+                # Shutting down anyway, nothing left to report to
+                pass
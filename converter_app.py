@@ -1,7 +1,13 @@
 import streamlit as st
 import pandas as pd
-import json
 import io
+import json
+from vehicle_json import read_export, find_json_columns, extract_vehicles, summarize_stats, vehicles_to_dataframe
+from inventory_schema import write_typed
+from metrics import RunMetrics, summary_rows
+from dedupe import POLICIES, POLICY_LABELS, Deduper
+from records import VehicleColumns
+from parallel_parse import PARSE_PROCESSES
 
 st.set_page_config(page_title="JSON to CSV Converter", page_icon="🛠️", layout="wide")
 
@@ -12,95 +18,87 @@ This tool will automatically extract the hidden JSON data (VIN, MSRP, etc.) and
 """)
 
 uploaded_file = st.file_uploader("Drop your CSV file here", type=["csv"])
+out_format = st.selectbox("Output format", ["csv", "parquet", "feather"],
+                          help="Parquet/Feather keep typed columns (numeric prices and year, categorical colors).")
+dedupe = st.selectbox("Repeated vehicles (same VIN / stock #)", POLICIES, format_func=POLICY_LABELS.get,
+                      help="The same vehicle can sit in several rows or extraction columns; only one row per vehicle is kept.")
 
 if uploaded_file is not None:
     st.info("Processing file...")
+    metrics = RunMetrics("converter")
+    metrics.set("input", uploaded_file.name)
     
     try:
         # Read the file
         # Try-catch for encoding issues which are common with Excel exports
-        try:
-            df = pd.read_csv(uploaded_file)
-        except UnicodeDecodeError:
-            uploaded_file.seek(0)
-            df = pd.read_csv(uploaded_file, encoding='latin1')
+        with metrics.timer("read"):
+            df = read_export(uploaded_file)
+        metrics.count("rows", len(df))
             
-        # Find JSON columns
-        # We look for columns containing "{" and "vin" or just "{" and "}" structure
-        json_cols = [col for col in df.columns if df[col].astype(str).str.contains('{"', regex=False).any()]
+        # Find JSON columns (checks a sample of each column)
+        with metrics.timer("detect"):
+            json_cols = find_json_columns(df)
         
         if not json_cols:
             st.error("❌ No usage data found. Are you sure this is a Custom Extraction export with JSON data?")
             st.write("Columns found:", df.columns.tolist())
         else:
-            success_count = 0
-            all_vehicles = []
-            
             # Progress bar
             progress_bar = st.progress(0)
             
-            # Iterate and Extract
-            # Using iterrows is slow for massive files but fine for typical inventory < 10k rows
-            total_rows = len(df)
-            
-            for index, row in df.iterrows():
-                # Update progress every 10%
-                if index % max(1, int(total_rows / 10)) == 0:
-                    progress_bar.progress(int((index / total_rows) * 100))
-                    
-                for col in json_cols:
-                    cell_value = row[col]
-                    if pd.isna(cell_value):
-                        continue
-                    
-                    cell_value = str(cell_value).strip()
-                    if cell_value.startswith("{") and cell_value.endswith("}"):
-                        try:
-                            # Parse JSON
-                            data = json.loads(cell_value)
-                            all_vehicles.append(data)
-                            success_count += 1
-                        except json.JSONDecodeError:
-                            # Try simple fix for double-quotes escaped by CSV format
-                            try:
-                                fixed_val = cell_value.replace('""', '"')
-                                data = json.loads(fixed_val)
-                                all_vehicles.append(data)
-                                success_count += 1
-                            except:
-                                pass
+            # Extract all JSON cells, large files in shards on every CPU core
+            # Parsed straight into compact columns, repeats dropped on the way in
+            deduper = Deduper(dedupe, VehicleColumns())
+            with metrics.timer("parse"):
+                _, stats = extract_vehicles(df, json_cols, out=deduper, processes=PARSE_PROCESSES,
+                                            progress=lambda done, total: progress_bar.progress(done / total))
+            all_vehicles, duplicates = deduper.vehicles, deduper.duplicates
+            metrics.add_counts(summarize_stats(stats), prefix="json_")
+            metrics.count("duplicates", duplicates)
             
             progress_bar.progress(100)
             
             if not all_vehicles:
                 st.warning("Found JSON columns but failed to extract valid objects. Check file format.")
+                st.dataframe(pd.DataFrame(stats).T)
             else:
-                # Create DataFrame
-                clean_df = pd.DataFrame(all_vehicles)
-                
-                # Column Ordering
-                priority_cols = ['vin', 'stock', 'year', 'make', 'model', 'trim', 'price', 'msrp', 'ext_color', 'int_color']
-                actual_cols = clean_df.columns.tolist()
-                final_order = [c for c in priority_cols if c in actual_cols] + [c for c in actual_cols if c not in priority_cols]
-                clean_df = clean_df[final_order]
+                # Create DataFrame (priority columns first)
+                with metrics.timer("dataframe"):
+                    clean_df = vehicles_to_dataframe(all_vehicles)
+                metrics.count("vehicles", len(clean_df))
                 
                 # Success UI
-                st.success(f"✅ Successfully extracted **{len(clean_df)}** vehicles!")
+                st.success(f"✅ Successfully extracted **{len(clean_df)}** vehicles!"
+                           + (f" ({duplicates} duplicates removed)" if duplicates else ""))
                 
                 # Preview
                 st.subheader("Preview")
                 st.dataframe(clean_df.head(5))
                 
+                with st.expander("Parse report per column"):
+                    st.dataframe(pd.DataFrame(stats).T)
+                
                 # Download Button
-                csv_buffer = clean_df.to_csv(index=False).encode('utf-8')
+                with metrics.timer("write"):
+                    if out_format == "csv":
+                        file_data = clean_df.to_csv(index=False).encode('utf-8')
+                    else:
+                        buffer = io.BytesIO()
+                        write_typed(clean_df, buffer, out_format)
+                        file_data = buffer.getvalue()
                 
                 st.download_button(
-                    label="📥 Download Cleaned CSV",
-                    data=csv_buffer,
-                    file_name="cleaned_inventory.csv",
-                    mime="text/csv",
+                    label=f"📥 Download Cleaned {out_format.upper()}",
+                    data=file_data,
+                    file_name=f"cleaned_inventory.{out_format}",
+                    mime="text/csv" if out_format == "csv" else "application/octet-stream",
                     type="primary"
                 )
 
+                with st.expander("📈 Run metrics"):
+                    st.dataframe(pd.DataFrame(summary_rows(metrics.to_dict())), hide_index=True, use_container_width=True)
+                    st.download_button("Download metrics JSON", data=json.dumps(metrics.to_dict(), indent=2),
+                                       file_name="cleaned_inventory.metrics.json", mime="application/json")
+
     except Exception as e:
         st.error(f"Error processing file: {e}")
@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+import time
+
+DEFAULT_JOURNAL_PATH = os.path.join(os.getcwd(), "scrape_checkpoint.jsonl")
+
+
+class CrawlJournal:
+    """Append-only JSONL checkpoint of a scrape_all crawl.
+
+    One "start" line per run, one "page" line per finished page (with its
+    vehicles) and a "done" line once the crawl completed. A crawl that never
+    wrote "done" can be resumed from the pages already in the journal. Several
+    urls can share one journal; each one's entries are read on their own.
+    """
+
+    def __init__(self, path=DEFAULT_JOURNAL_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _read(self):
+        entries = []
+        if not os.path.exists(self.path):
+            return entries
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # A crash mid-write leaves at most one broken last line
+                    continue
+        return entries
+
+    def _append(self, entry):
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self, url):
+        # Pages of the last unfinished crawl of this url: {page_index: vehicles}
+        pages = {}
+        for entry in self._read():
+            if entry.get("url") != url:
+                continue
+            if entry["type"] in ("start", "done"):
+                pages = {}
+            elif entry["type"] == "page":
+                pages[entry["page_index"]] = entry["vehicles"]
+        return pages
+
+    def _compact(self, url):
+        # Rewrite the journal with only the unfinished crawls of other urls,
+        # so it doesn't grow run after run (their checkpoints stay resumable)
+        latest = {}
+        for entry in self._read():
+            other = entry.get("url")
+            if other == url:
+                continue
+            if entry["type"] == "start":
+                latest[other] = [entry]
+            elif entry["type"] == "done":
+                latest.pop(other, None)
+            else:
+                latest.setdefault(other, []).append(entry)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entries in latest.values():
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def start(self, url, resume=False):
+        # Returns the pages to reuse. A fresh start drops this url's old entries
+        # (and finished crawls), other urls' unfinished checkpoints are kept.
+        pages = self.load(url) if resume else {}
+        if not pages:
+            with self._lock:
+                self._compact(url)
+            self._append({"type": "start", "url": url, "time": time.time()})
+        return pages
+
+    def record_page(self, url, page_index, vehicles):
+        self._append({"type": "page", "url": url, "page_index": page_index, "vehicles": vehicles})
+
+    def mark_done(self, url):
+        self._append({"type": "done", "url": url, "time": time.time()})
@@ -0,0 +1,146 @@
+# Repeated vehicles (featured cars shown on every page, the same vehicle in two
+# extraction columns, overlapping crawl shards) are collapsed to one per VIN,
+# or per stock number when the VIN is missing. Vehicles with neither are kept.
+
+# first: the first copy wins; latest: the last copy wins;
+# merge: the first copy, with every field a later copy has a value for overwritten by it
+POLICIES = ("first", "latest", "merge")
+DEFAULT_POLICY = "first"
+# For the apps' select boxes
+POLICY_LABELS = {"first": "Keep the first copy", "latest": "Keep the latest copy", "merge": "Merge the copies' fields"}
+
+
+def check_policy(policy):
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown duplicate policy {policy!r}, expected one of: {', '.join(POLICIES)}")
+    return policy
+
+
+def vehicle_key(vehicle):
+    # VIN, else stock number; None when neither is there (never counted as a duplicate)
+    if not isinstance(vehicle, dict):
+        return None
+    vin = vehicle.get("vin")
+    if vin:
+        return "vin:" + str(vin).strip().upper()
+    stock = vehicle.get("stock")
+    if stock:
+        return "stock:" + str(stock).strip()
+    return None
+
+
+def merge_vehicle(base, other):
+    merged = dict(base)
+    for key, value in other.items():
+        if value is not None and value != "":
+            merged[key] = value
+        else:
+            merged.setdefault(key, value)
+    return merged
+
+
+def resolve(kept, new, policy):
+    if policy == "latest":
+        return new
+    if policy == "merge":
+        return merge_vehicle(kept, new)
+    return kept
+
+
+class Deduper:
+    """Collects vehicles one by one, keeping one per VIN / stock number.
+
+    The surviving copy keeps the position of the first one seen; policy
+    decides what it holds (see POLICIES, None keeps every copy). Besides the
+    vehicles only a key -> position index is kept, so a scrape or a batch of
+    exports can be fed through add() as it is extracted. vehicles can be any
+    list-like to collect into, e.g. a records.VehicleColumns.
+    """
+
+    def __init__(self, policy=DEFAULT_POLICY, vehicles=None):
+        self.policy = check_policy(policy) if policy else None
+        self.vehicles = [] if vehicles is None else vehicles
+        self.duplicates = 0
+        self._index = {}
+
+    def add(self, vehicle):
+        # True if the vehicle is new, False if it was a repeat
+        key = vehicle_key(vehicle) if self.policy else None
+        if key is not None:
+            slot = self._index.get(key)
+            if slot is not None:
+                self.duplicates += 1
+                if self.policy != "first":
+                    self.vehicles[slot] = resolve(self.vehicles[slot], vehicle, self.policy)
+                return False
+            self._index[key] = len(self.vehicles)
+        self.vehicles.append(vehicle)
+        return True
+
+    # So a Deduper can stand in for the output list of vehicle_json.extract_vehicles
+    append = add
+
+    def add_all(self, vehicles):
+        for vehicle in vehicles:
+            self.add(vehicle)
+        return self
+
+    def add_batch(self, batch, keys):
+        """Add a block of vehicles whose keys were worked out elsewhere (e.g. in a parse worker).
+
+        batch is indexable, keys[i] is vehicle_key(batch[i]). Same result as
+        add() one by one; when vehicles is a records.VehicleColumns and
+        batch another one, the new vehicles are copied column by column.
+        """
+        kept = []
+        repeats = []
+        slot = len(self.vehicles)
+        for row, key in enumerate(keys):
+            if key is not None and self.policy:
+                seen = self._index.get(key)
+                if seen is not None:
+                    self.duplicates += 1
+                    if self.policy != "first":
+                        repeats.append((seen, row))
+                    continue
+                self._index[key] = slot
+            kept.append(row)
+            slot += 1
+        if hasattr(self.vehicles, "extend_rows"):
+            self.vehicles.extend_rows(batch, kept)
+        else:
+            self.vehicles.extend(batch[row] for row in kept)
+        for seen, row in repeats:
+            self.vehicles[seen] = resolve(self.vehicles[seen], batch[row], self.policy)
+        return self
+
+
+def dedupe_vehicles(vehicles, policy=DEFAULT_POLICY):
+    # (kept vehicles, duplicates removed) for a list in one go
+    deduper = Deduper(policy).add_all(vehicles)
+    return deduper.vehicles, deduper.duplicates
+
+
+def collapse_repeats(read, counts, policy):
+    """Dedupe a source too big for memory that can be read twice (e.g. a spool file).
+
+    read() yields the vehicles again on every call; counts maps each key to
+    how often it occurs in them (counted while the source was written).
+    Only the repeated vehicles are held in memory while the first pass
+    resolves them; the second pass yields each one at its first position.
+    """
+    check_policy(policy)
+    repeated = {}
+    for vehicle in read():
+        key = vehicle_key(vehicle)
+        if counts.get(key, 1) > 1:
+            repeated[key] = resolve(repeated[key], vehicle, policy) if key in repeated else vehicle
+
+    written = set()
+    for vehicle in read():
+        key = vehicle_key(vehicle)
+        if key not in repeated:
+            yield vehicle
+        elif key not in written:
+            written.add(key)
+            yield repeated[key]
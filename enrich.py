@@ -0,0 +1,249 @@
+# Optional enrichment stage: the data-vehicle payload on listing pages only has
+# summary fields, anything else (mileage, engine, options, photo count...) is on
+# each vehicle's detail page. Those pages are fetched over HTTP a few at a time,
+# politely spaced per host, and what they add is merged into the vehicles.
+# Details are cached per VIN, so a rerun only visits new vehicles.
+import json
+import re
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from throttle import DomainRateLimiter
+from fetch_engine import create_session, fetch_page, is_challenge
+from html_extract import extract_vehicle_json
+from dedupe import vehicle_key
+from page_cache import DEFAULT_CACHE_DIR, PageCache
+
+ENRICH_CONCURRENCY = 4  # Detail pages fetched at once
+ENRICH_RATE_LIMIT = 1.0  # Minimum seconds between two detail pages on the same host
+ENRICH_TTL = 24 * 60 * 60  # Seconds a vehicle's details are reused before its page is visited again
+MAX_BLOCKED = 5  # Security checks in a row before the remaining detail pages are given up
+PROGRESS_EVERY = 25  # Print a progress line every this many detail pages
+
+# Fields of the listing payload that may hold the detail page link, in order of preference
+URL_FIELDS = ("url", "link", "vdp_url", "vdpUrl", "detail_url", "detailUrl", "href")
+
+# schema.org Vehicle / Car properties kept from a detail page's JSON-LD, and their column
+JSON_LD_FIELDS = {
+    "mileageFromOdometer": "odometer",
+    "vehicleEngine": "engine",
+    "vehicleTransmission": "transmission",
+    "fuelType": "fuel_type",
+    "driveWheelConfiguration": "drivetrain",
+    "bodyType": "body",
+    "numberOfDoors": "doors",
+    "vehicleSeatingCapacity": "seats",
+    "vehicleConfiguration": "configuration",
+    "description": "description",
+}
+_VEHICLE_TYPES = {"Vehicle", "Car", "Motorcycle", "Product"}
+_JSON_LD_RE = re.compile(r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.S | re.I)
+
+_CACHE_KIND = "details"
+_STATS = ("enriched", "cached", "no_url", "failed", "blocked")
+
+
+def detail_cache(cache_dir=DEFAULT_CACHE_DIR, ttl=ENRICH_TTL):
+    # Details live next to the cached listing pages, under their own kind and TTL
+    return PageCache(cache_dir, ttl=ttl)
+
+
+def detail_url(vehicle, base_url):
+    # Absolute link to the vehicle's detail page, or None when the listing has none
+    for field in URL_FIELDS:
+        link = vehicle.get(field)
+        if isinstance(link, str) and link.strip():
+            url = urllib.parse.urljoin(base_url, link.strip())
+            if url.startswith(("http://", "https://")):
+                return url
+    return None
+
+
+def _json_ld_nodes(html):
+    # Every JSON-LD object on the page, @graph entries and lists flattened
+    for block in _JSON_LD_RE.findall(html):
+        try:
+            data = json.loads(block.strip())
+        except ValueError:
+            continue
+        stack = [data]
+        while stack:
+            node = stack.pop()
+            if isinstance(node, list):
+                stack.extend(reversed(node))
+            elif isinstance(node, dict):
+                yield node
+                if isinstance(node.get("@graph"), list):
+                    stack.extend(reversed(node["@graph"]))
+
+
+def _plain(value):
+    # QuantitativeValue / named objects / lists down to a plain cell value
+    if isinstance(value, dict):
+        value = value.get("value", value.get("name"))
+    elif isinstance(value, list):
+        parts = [_plain(v) for v in value]
+        value = ", ".join(str(p) for p in parts if p not in (None, ""))
+    return value if value not in ("", None) else None
+
+
+def _json_ld_details(html, vin=None):
+    best = None
+    for node in _json_ld_nodes(html):
+        types = node.get("@type")
+        types = set(types) if isinstance(types, list) else {types}
+        if not types & _VEHICLE_TYPES:
+            continue
+        node_vin = str(node.get("vehicleIdentificationNumber") or "").strip().upper()
+        if vin and node_vin == vin:
+            best = node
+            break
+        if best is None and ("Product" not in types or node_vin):
+            best = node
+    if best is None:
+        return {}
+
+    details = {}
+    for prop, column in JSON_LD_FIELDS.items():
+        value = _plain(best.get(prop))
+        if value is not None:
+            details[column] = value
+    images = best.get("image")
+    if images:
+        details["photo_count"] = len(images) if isinstance(images, list) else 1
+    options = []
+    for prop in best.get("additionalProperty") or []:
+        if not isinstance(prop, dict) or not prop.get("name"):
+            continue
+        name, value = _plain(prop["name"]), _plain(prop.get("value"))
+        # Feature lists are often name-only or flagged true
+        options.append(name if value is None or value is True else f"{name}: {value}")
+    if options:
+        details["options"] = "; ".join(options)
+    return details
+
+
+def parse_details(html, vin=None):
+    """Extra fields a detail page has about its vehicle.
+
+    The page's own data-vehicle payload (many dealer platforms render a
+    fuller one on detail pages) comes first, then the schema.org Vehicle
+    JSON-LD. vin picks the right vehicle when the page lists several
+    (e.g. "similar vehicles").
+    """
+    details = {}
+    for raw in extract_vehicle_json(html):
+        try:
+            payload = json.loads(raw)
+        except ValueError:
+            continue
+        if not isinstance(payload, dict):
+            continue
+        payload_vin = str(payload.get("vin") or "").strip().upper()
+        if not vin or payload_vin == vin:
+            details = payload
+            break
+    for key, value in _json_ld_details(html, vin).items():
+        details.setdefault(key, value)
+    return details
+
+
+def merge_details(vehicle, details):
+    # Listing values win (prices there are the ones just scraped); details only fill the gaps
+    merged = dict(vehicle)
+    for key, value in details.items():
+        if merged.get(key) in (None, ""):
+            merged[key] = value
+    return merged
+
+
+def enrich_vehicles(vehicles, base_url, session=None, concurrency=ENRICH_CONCURRENCY, rate_limit=ENRICH_RATE_LIMIT,
+                    cache=None, metrics=None, progress=None):
+    """Visit every vehicle's detail page and merge the extra fields into the vehicle.
+
+    vehicles is a list of vehicle dicts or a records.VehicleColumns; enriched
+    vehicles are replaced in place. Detail links come from the listing
+    payload (URL_FIELDS), resolved against base_url. Pages are fetched over
+    session (e.g. fetch_engine.session_from_driver, to reuse a cleared
+    security check) by concurrency threads, at most one per rate_limit
+    seconds per host. cache (see detail_cache) skips vehicles enriched
+    within its TTL, keyed by VIN / stock number. After MAX_BLOCKED security
+    checks in a row the remaining pages are given up. progress(done, total)
+    is called per fetched page. Returns the enriched / cached / no_url /
+    failed / blocked counts.
+    """
+    stats = dict.fromkeys(_STATS, 0)
+    rows = list(vehicles)
+    jobs = {}  # detail url -> [(row, cache key)], several rows when vehicles share a page
+    for row, vehicle in enumerate(rows):
+        url = detail_url(vehicle, base_url)
+        if url is None:
+            stats["no_url"] += 1
+            continue
+        key = "details:" + (vehicle_key(vehicle) or url)
+        details = cache.get(key, kind=_CACHE_KIND) if cache is not None else None
+        if details is not None:
+            vehicles[row] = merge_details(vehicle, details)
+            stats["cached"] += 1
+            continue
+        jobs.setdefault(url, []).append((row, key))
+
+    if not jobs:
+        return stats
+    print(f"Enriching {sum(len(j) for j in jobs.values())} vehicles from {len(jobs)} detail pages "
+          f"({stats['cached']} from cache)...")
+    own_session = session is None
+    session = session or create_session(pool_size=max(1, concurrency))
+    limiter = DomainRateLimiter(rate_limit)
+
+    def fetch(url):
+        limiter.wait(url)
+        return fetch_page(session, url)
+
+    blocked_in_row = 0
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+            futures = {pool.submit(fetch, url): url for url in jobs}
+            for done, future in enumerate(as_completed(futures), 1):
+                url = futures[future]
+                status, html, seconds = future.result()
+                if metrics is not None:
+                    metrics.add_time("detail_fetch", seconds)
+                if is_challenge(status, html):
+                    stats["blocked"] += len(jobs[url])
+                    blocked_in_row += 1
+                    if blocked_in_row >= MAX_BLOCKED:
+                        print("Detail pages keep showing a security check, skipping the rest.")
+                        for pending in futures:
+                            pending.cancel()
+                        break
+                    continue
+                blocked_in_row = 0
+                for row, key in jobs[url]:
+                    try:
+                        details = parse_details(html, str(rows[row].get("vin") or "").strip().upper()) if status == 200 else {}
+                    except Exception as e:
+                        # e.g. a parser choking on an odd page; only this vehicle goes without details
+                        print(f"Could not read details from {url}: {e}")
+                        details = {}
+                    if not details:
+                        stats["failed"] += 1
+                        continue
+                    vehicles[row] = merge_details(rows[row], details)
+                    stats["enriched"] += 1
+                    if cache is not None:
+                        cache.put(key, details, kind=_CACHE_KIND)
+                if progress:
+                    progress(done, len(futures))
+                if done % PROGRESS_EVERY == 0:
+                    print(f"  {done}/{len(futures)} detail pages done")
+    finally:
+        if own_session:
+            session.close()
+
+    # Vehicles of pages never fetched (given up after the security checks)
+    stats["blocked"] += sum(len(j) for j in jobs.values()) - sum(stats[k] for k in ("enriched", "failed", "blocked"))
+    if metrics is not None:
+        metrics.add_counts(stats, prefix="details_")
+    print(f"Details: {stats['enriched']} enriched, {stats['cached']} from cache, {stats['failed']} failed, "
+          f"{stats['blocked']} blocked, {stats['no_url']} without a detail link.")
+    return stats
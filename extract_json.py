@@ -1,107 +1,134 @@
-import pandas as pd
-import json
-import tkinter as tk
-from tkinter import filedialog
+import argparse
 import os
+import sys
+from metrics import RunMetrics
+from dedupe import POLICIES, Deduper
+from records import VehicleColumns
+from parallel_parse import PARSE_PROCESSES
+
+OUTPUT_FORMAT = "csv"  # "csv", "parquet" or "feather" (typed columns)
+DEDUPE_POLICY = "first"  # Repeated VIN / stock number: "first", "latest" or "merge" (fields combined); None keeps all
+
+def pick_file():
+    # tkinter is only loaded for the file picker, headless runs never need it
+    import tkinter as tk
+    from tkinter import filedialog
 
-def clean_and_convert():
     print("Please select the CSV file extracted from Screaming Frog...")
-    
+
     # Hide the main tkinter window
     root = tk.Tk()
     root.withdraw()
 
     # Open file selector
-    file_path = filedialog.askopenfilename(
+    return filedialog.askopenfilename(
         title="Select Screaming Frog Export CSV",
         filetypes=[("CSV files", "*.csv"), ("All files", "*.*")]
     )
 
-    if not file_path:
-        print("No file selected. Exiting.")
-        return
+def clean_and_convert(file_path, output_path=None, output_format=OUTPUT_FORMAT, dedupe=DEDUPE_POLICY,
+                      processes=PARSE_PROCESSES):
+    # Returns the path of the cleaned file, or None when nothing could be extracted
+    from vehicle_json import read_export, find_json_columns, extract_vehicles, format_stats, summarize_stats, vehicles_to_dataframe
+    from inventory_schema import write_table
 
     print(f"Processing: {file_path}")
-    
+    metrics = RunMetrics("extract_json")
+    metrics.set("input", file_path)
+
     try:
         # Load the CSV
         # We assume the file might have extra header rows or strange encoding depending on Excel export settings
-        try:
-            df = pd.read_csv(file_path)
-        except UnicodeDecodeError:
-            df = pd.read_csv(file_path, encoding='latin1')
+        with metrics.timer("read"):
+            df = read_export(file_path)
+        metrics.count("rows", len(df))
 
         # Find columns that look like they contain the JSON data
         # Screaming Frog usually names them "Vehicle Data 1", "Vehicle Data 2", etc.
         # or sometimes just one column if you did a different extraction.
-        # We will look for any column that contains "{" and "vin" as a heuristic
-        
-        json_cols = [col for col in df.columns if df[col].astype(str).str.contains('{"', regex=False).any()]
-        
+        with metrics.timer("detect"):
+            json_cols = find_json_columns(df)
+
         if not json_cols:
             print("Could not automatically find columns containing JSON data.")
             print("Columns found:", df.columns.tolist())
-            return
-            
+            return None
+
         print(f"Found {len(json_cols)} columns potentially containing vehicle JSON.")
-        
-        all_vehicles = []
-        
-        for index, row in df.iterrows():
-            for col in json_cols:
-                cell_value = row[col]
-                if pd.isna(cell_value):
-                    continue
-                
-                # Clean up string if necessary (Screaming Frog sometimes leaves whitespace)
-                cell_value = str(cell_value).strip()
-                
-                if cell_value.startswith("{") and cell_value.endswith("}"):
-                    try:
-                        data = json.loads(cell_value)
-                        all_vehicles.append(data)
-                    except json.JSONDecodeError:
-                        # Sometimes quotes are escaped weirdly in CSVs
-                        try:
-                            # Attempt very basic fix for CSV double-quote escaping
-                            fixed_val = cell_value.replace('""', '"')
-                            data = json.loads(fixed_val)
-                            all_vehicles.append(data)
-                        except:
-                            pass
-                            
+
+        # Parsed straight into compact columns, repeats dropped on the way in
+        deduper = Deduper(dedupe, VehicleColumns())
+        with metrics.timer("parse"):
+            _, stats = extract_vehicles(df, json_cols, out=deduper, processes=processes)
+        all_vehicles = deduper.vehicles
+        metrics.add_counts(summarize_stats(stats), prefix="json_")
+        metrics.count("duplicates", deduper.duplicates)
+        for line in format_stats(stats):
+            print(f"  {line}")
+        if deduper.duplicates:
+            print(f"  Dropped {deduper.duplicates} duplicate vehicles.")
+
         if not all_vehicles:
             print("No valid JSON objects were extracted. Please check the CSV format.")
-            return
-            
-        # Create new DataFrame from the dictionary list
-        clean_df = pd.DataFrame(all_vehicles)
-        
-        # Organize columns nicely
-        # Prioritize key fields
-        priority_cols = ['vin', 'stock', 'year', 'make', 'model', 'trim', 'price', 'msrp', 'ext_color', 'int_color']
-        
-        # Get all actual columns present
-        actual_cols = clean_df.columns.tolist()
-        
-        # Create final column order: Priority ones first (if they exist), then the rest
-        final_order = [c for c in priority_cols if c in actual_cols] + [c for c in actual_cols if c not in priority_cols]
-        
-        clean_df = clean_df[final_order]
-        
+            return None
+
+        # Create new DataFrame (priority fields first, then the rest)
+        with metrics.timer("dataframe"):
+            clean_df = vehicles_to_dataframe(all_vehicles)
+
         # Save output
-        output_path = os.path.splitext(file_path)[0] + "_cleaned.csv"
-        clean_df.to_csv(output_path, index=False)
-        
+        output_path = output_path or os.path.splitext(file_path)[0] + f"_cleaned.{output_format}"
+        with metrics.timer("write"):
+            write_table(clean_df, output_path)
+        metrics.count("vehicles", len(clean_df))
+
         print(f"✅ Success! Extracted {len(clean_df)} vehicles.")
         print(f"💾 Saved clean file to: {output_path}")
-        
+        print(f"📈 Run metrics: {metrics.write(output_path)}")
+        return output_path
+
     except Exception as e:
         print(f"An error occurred: {e}")
+        return None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract the vehicle JSON from Screaming Frog export(s) into a clean file.")
+    parser.add_argument("files", nargs="*", help="Screaming Frog CSV export(s); a file picker opens when none are given")
+    parser.add_argument("--gui", action="store_true", help="Pick the file in a dialog even if files are given")
+    parser.add_argument("-o", "--output", help="Output file, only with a single input (default: <input>_cleaned.<format>)")
+    parser.add_argument("--format", choices=["csv", "parquet", "feather"], default=OUTPUT_FORMAT,
+                        help="Output format when --output is not given")
+    parser.add_argument("--dedupe", choices=[*POLICIES, "none"], default=DEDUPE_POLICY or "none",
+                        help="What to keep of vehicles with the same VIN / stock number")
+    parser.add_argument("--processes", type=int, default=PARSE_PROCESSES,
+                        help="Worker processes decoding large exports (default: one per CPU core, 1 disables)")
+    args = parser.parse_args(argv)
+
+    files = args.files
+    if args.gui or not files:
+        file_path = pick_file()
+        if not file_path:
+            print("No file selected. Exiting.")
+            return 1
+        files = [file_path]
+    if args.output and len(files) > 1:
+        parser.error("--output can only be used with a single input file")
+
+    dedupe = None if args.dedupe == "none" else args.dedupe
+    failed = 0
+    for file_path in files:
+        if not clean_and_convert(file_path, args.output, args.format, dedupe, args.processes):
+            failed += 1
+    return 1 if failed else 0
 
 if __name__ == "__main__":
+    # Double-clicked (no arguments): keep the window open to read the result
+    interactive = len(sys.argv) == 1
+    code = 1
     try:
-        clean_and_convert()
-        input("\nPress Enter to close...")
+        code = main()
+        if interactive:
+            input("\nPress Enter to close...")
     except KeyboardInterrupt:
         pass
+    sys.exit(code)
@@ -0,0 +1,84 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
+
+# Looks like a regular desktop Chrome so dealer sites serve the normal page
+DEFAULT_USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+                      "(KHTML, like Gecko) Chrome/124.0.0.0 Safari/537.36")
+FETCH_TIMEOUT = 20  # Seconds per HTTP request
+DEFAULT_CONCURRENCY = 4  # Pages fetched at once
+
+# Text that only shows up on Cloudflare / bot-protection interstitials. Not
+# "challenge-platform": Cloudflare injects /cdn-cgi/challenge-platform/ scripts
+# into ordinary pages too.
+CHALLENGE_MARKERS = (
+    "Just a moment...",
+    "cf-browser-verification",
+    "cf_chl_opt",
+    'id="challenge-form"',
+    "Attention Required! | Cloudflare",
+)
+
+
+def create_session(pool_size=DEFAULT_CONCURRENCY):
+    # One keep-alive connection pool shared by every page request
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update({
+        "User-Agent": DEFAULT_USER_AGENT,
+        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+        "Accept-Language": "en-US,en;q=0.9",
+    })
+    return session
+
+
+def is_challenge(status, html):
+    if status is None:
+        return True
+    if status in (403, 429, 503):
+        return True
+    if "data-vehicle" in html:
+        # The inventory is there, whatever else the page carries
+        return False
+    return any(marker in html for marker in CHALLENGE_MARKERS)
+
+
+def fetch_page(session, url, timeout=FETCH_TIMEOUT):
+    # Returns (status, html, seconds). status is None when the request itself failed.
+    start = time.monotonic()
+    try:
+        response = session.get(url, timeout=timeout)
+        return response.status_code, response.text, time.monotonic() - start
+    except requests.RequestException as e:
+        print(f"HTTP fetch failed for {url}: {e}")
+        return None, "", time.monotonic() - start
+
+
+def fetch_pages(session, urls, concurrency=DEFAULT_CONCURRENCY, limiter=None, timeout=FETCH_TIMEOUT):
+    # Fetch several pages at once over the shared session. Returns {url: (status, html, seconds)}.
+    def fetch(url):
+        if limiter is not None:
+            limiter.wait(url)
+        return fetch_page(session, url, timeout)
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        return dict(zip(urls, pool.map(fetch, urls)))
+
+
+def session_from_driver(driver, session=None):
+    # Reuse the cookies (incl. cf_clearance) and user agent the browser just earned
+    if session is None:
+        session = create_session()
+    try:
+        user_agent = driver.execute_script("return navigator.userAgent")
+        if user_agent:
+            session.headers["User-Agent"] = user_agent
+    except Exception as e:
+        print(f"Could not read browser user agent: {e}")
+    for cookie in driver.get_cookies():
+        session.cookies.set(cookie["name"], cookie["value"],
+                            domain=cookie.get("domain"), path=cookie.get("path", "/"))
+    return session
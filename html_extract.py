@@ -0,0 +1,89 @@
+from html.parser import HTMLParser
+
+# Optional C-based parser. The streaming tokenizer below is used when it is missing.
+try:
+    import lxml.html
+except ImportError:
+    lxml = None
+
+ENGINES = ("auto", "lxml", "stream", "strainer", "soup")
+
+_RESULT_WRAP_XPATH = ("//*[contains(concat(' ', normalize-space(@class), ' '), ' result-wrap ')]"
+                      "/@data-vehicle")
+
+
+def _has_result_wrap(class_value):
+    return bool(class_value) and "result-wrap" in class_value.split()
+
+
+def extract_lxml(html):
+    if not html.strip():
+        return []
+    try:
+        tree = lxml.html.fromstring(html)
+    except ValueError:
+        # Pages starting with an XML encoding declaration must be passed as bytes
+        tree = lxml.html.fromstring(html.encode("utf-8"))
+    return [str(value) for value in tree.xpath(_RESULT_WRAP_XPATH) if value]
+
+
+class _VehicleAttrParser(HTMLParser):
+    # Tokenizes the page without building a tree; only start tags are looked at
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.values = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if attrs.get("data-vehicle") and _has_result_wrap(attrs.get("class")):
+            self.values.append(attrs["data-vehicle"])
+
+    handle_startendtag = handle_starttag
+
+
+def extract_stream(html):
+    parser = _VehicleAttrParser()
+    parser.feed(html)
+    parser.close()
+    return parser.values
+
+
+def extract_strainer(html):
+    from bs4 import BeautifulSoup, SoupStrainer
+    # Only elements carrying data-vehicle make it into the tree. Straining on
+    # class_ is unreliable here: newer bs4 matches it against the raw
+    # "result-wrap new-vehicle" string at parse time.
+    only_vehicles = SoupStrainer(attrs={"data-vehicle": True})
+    soup = BeautifulSoup(html, "html.parser", parse_only=only_vehicles)
+    return [tag["data-vehicle"] for tag in soup.find_all(attrs={"data-vehicle": True})
+            if tag["data-vehicle"] and "result-wrap" in tag.get("class", [])]
+
+
+def extract_soup(html):
+    # Full tree, same as the original scraper did
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    return [wrap.get("data-vehicle") for wrap in soup.select(".result-wrap") if wrap.get("data-vehicle")]
+
+
+_EXTRACTORS = {
+    "lxml": extract_lxml,
+    "stream": extract_stream,
+    "strainer": extract_strainer,
+    "soup": extract_soup,
+}
+
+
+def get_extractor(engine="auto"):
+    if engine == "auto":
+        engine = "lxml" if lxml is not None else "stream"
+    if engine not in _EXTRACTORS:
+        raise ValueError(f"Unknown HTML engine '{engine}'. Choose one of: {', '.join(ENGINES)}")
+    if engine == "lxml" and lxml is None:
+        raise ImportError("The lxml engine needs lxml (pip install lxml)")
+    return _EXTRACTORS[engine]
+
+
+def extract_vehicle_json(html, engine="auto"):
+    # Raw data-vehicle attribute values of every .result-wrap on the page
+    return get_extractor(engine)(html)
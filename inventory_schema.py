@@ -0,0 +1,165 @@
+import json
+import os
+import pandas as pd
+
+# Field kinds, by raw JSON key and by the scraper's display name
+FIELD_KINDS = {
+    "vin": "vin", "VIN": "vin",
+    "stock": "text", "Stock #": "text",
+    "year": "year", "Year": "year",
+    "price": "money", "Final Price": "money",
+    "msrp": "money", "MSRP": "money",
+    "make": "category", "Make": "category",
+    "model": "category", "Model": "category",
+    "trim": "category", "Trim": "category",
+    "ext_color": "category", "Exterior Color": "category",
+    "int_color": "category", "Interior Color": "category",
+}
+
+TYPED_FORMATS = ("parquet", "feather")
+
+
+def typed_format(path):
+    # "parquet" / "feather" for typed outputs, None for anything else (CSV)
+    ext = os.path.splitext(path)[1].lower()
+    if ext in (".parquet", ".pq"):
+        return "parquet"
+    if ext in (".feather", ".arrow"):
+        return "feather"
+    return None
+
+
+def _text(series):
+    return series.astype("string").str.strip().replace("", pd.NA)
+
+
+def to_money(series):
+    # "$31,995" -> 31995; text like "Call for price" becomes missing.
+    # Whole-dollar columns stay integers (nullable), so CSVs keep "31995" rather than "31995.0"
+    if pd.api.types.is_numeric_dtype(series):
+        money = series.astype("float64")
+    else:
+        cleaned = _text(series).str.replace(r"[\$,\s]", "", regex=True)
+        money = pd.to_numeric(cleaned, errors="coerce").astype("float64")
+    present = money.dropna()
+    if (present == present.round()).all():
+        return money.astype("Int64")
+    return money
+
+
+def to_year(series):
+    return pd.to_numeric(series if pd.api.types.is_numeric_dtype(series) else _text(series),
+                         errors="coerce").round().astype("Int16")
+
+
+def normalize_series(series, kind):
+    if kind == "money":
+        return to_money(series)
+    if kind == "year":
+        return to_year(series)
+    if kind == "vin":
+        return _text(series).str.upper()
+    if kind == "category":
+        return _text(series).astype("category")
+    return _text(series)
+
+
+def normalize_types(df):
+    """Typed copy of a vehicle table: prices/year numeric, colors etc. categorical, VIN/stock text."""
+    df = df.copy()
+    for col in df.columns:
+        kind = FIELD_KINDS.get(col)
+        if kind:
+            df[col] = normalize_series(df[col], kind)
+    return df
+
+
+def arrow_type(kind):
+    import pyarrow as pa
+    return {
+        "vin": pa.string(),
+        "text": pa.string(),
+        "year": pa.int16(),
+        "money": pa.float64(),
+        "category": pa.dictionary(pa.int32(), pa.string()),
+    }[kind]
+
+
+def _arrow_safe(series):
+    # Free-form columns: nested JSON becomes a JSON string, mixed values become text
+    if series.dtype != object:
+        return series
+    if series.map(lambda v: isinstance(v, (dict, list))).any():
+        return series.map(lambda v: json.dumps(v) if isinstance(v, (dict, list)) else (None if pd.isna(v) else str(v)))
+    kinds = {type(v) for v in series.dropna()}
+    if len(kinds) > 1:
+        return series.map(lambda v: None if pd.isna(v) else str(v))
+    return series
+
+
+def _as_text(series):
+    return series.map(lambda v: json.dumps(v) if isinstance(v, (dict, list))
+                      else (None if pd.api.types.is_scalar(v) and pd.isna(v) else str(v)))
+
+
+def stream_schema(columns):
+    # Fixed schema for batch-by-batch writers: declared types, text for everything else
+    import pyarrow as pa
+    kinds = [FIELD_KINDS.get(c) for c in columns]
+    return pa.schema([(str(c), arrow_type(k) if k else pa.string()) for c, k in zip(columns, kinds)])
+
+
+def to_arrow_table(df, schema=None):
+    """Arrow table with the declared types for known fields.
+
+    Other columns are inferred, or stored as text when a fixed schema (see
+    stream_schema) is given so every batch of a stream has the same types.
+    """
+    import pyarrow as pa
+
+    df = normalize_types(df)
+    if schema is not None:
+        df = df.reindex(columns=schema.names)
+    arrays = []
+    fields = []
+    for col in df.columns:
+        kind = FIELD_KINDS.get(col)
+        if kind:
+            series = df[col]
+            if kind == "category":
+                series = series.astype(object).where(series.notna(), None)
+                array = pa.array(series, type=pa.string(), from_pandas=True).dictionary_encode()
+            else:
+                array = pa.array(series, type=arrow_type(kind), from_pandas=True)
+        elif schema is not None:
+            array = pa.array(_as_text(df[col].astype(object)), type=pa.string(), from_pandas=True)
+        else:
+            array = pa.array(_arrow_safe(df[col]), from_pandas=True)
+        arrays.append(array)
+        fields.append(pa.field(str(col), array.type))
+    return pa.Table.from_arrays(arrays, schema=schema if schema is not None else pa.schema(fields))
+
+
+def write_typed(df, path_or_buffer, fmt="parquet"):
+    """Write a vehicle table as Parquet or Feather with the declared schema."""
+    try:
+        import pyarrow.parquet as pq
+        import pyarrow.feather as feather
+    except ImportError:
+        raise ImportError("Parquet/Feather output needs pyarrow (pip install pyarrow)")
+
+    table = to_arrow_table(df)
+    if fmt == "feather":
+        feather.write_feather(table, path_or_buffer)
+    else:
+        pq.write_table(table, path_or_buffer)
+    return table
+
+
+def write_table(df, path):
+    # Extension picks the format: .parquet/.pq, .feather/.arrow, otherwise CSV
+    fmt = typed_format(path)
+    if fmt:
+        write_typed(df, path, fmt)
+    else:
+        df.to_csv(path, index=False)
@@ -0,0 +1,212 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+DEFAULT_STORE_PATH = os.path.join(os.getcwd(), "inventory_store.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS vehicles (
+    vin TEXT PRIMARY KEY,
+    stock TEXT,
+    year TEXT,
+    make TEXT,
+    model TEXT,
+    trim TEXT,
+    price REAL,
+    msrp REAL,
+    data TEXT,
+    source TEXT,
+    first_seen TEXT,
+    last_seen TEXT,
+    last_run INTEGER,
+    active INTEGER DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_vehicles_stock ON vehicles(stock);
+CREATE INDEX IF NOT EXISTS idx_vehicles_make_model ON vehicles(make, model);
+CREATE INDEX IF NOT EXISTS idx_vehicles_source ON vehicles(source, active);
+
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT,
+    started TEXT,
+    finished TEXT,
+    complete INTEGER DEFAULT 0,
+    seen INTEGER DEFAULT 0,
+    added INTEGER DEFAULT 0,
+    removed INTEGER DEFAULT 0,
+    price_changed INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS changes (
+    run_id INTEGER,
+    vin TEXT,
+    change TEXT,
+    old_price REAL,
+    new_price REAL,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_changes_run ON changes(run_id);
+"""
+
+# Columns of the exported delta file, vehicle fields follow
+DELTA_COLS = ['change', 'vin', 'old_price', 'new_price']
+
+
+def to_number(value):
+    # "$31,995" / "31995" / 31995 -> 31995.0, anything else -> None
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).replace("$", "").replace(",", "").strip()
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def _text(value):
+    return None if value is None else str(value)
+
+
+class InventoryStore:
+    """Local SQLite store of every vehicle seen, keyed on VIN.
+
+    A run is begin_run() -> upsert() (any number of times) -> finish_run().
+    Vehicles of the same source that were active but not seen again are only
+    marked removed when the run covered the whole inventory (complete=True).
+    """
+
+    def __init__(self, path=DEFAULT_STORE_PATH):
+        self.path = path
+        # Shared with the parallel scraper's worker threads
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(_SCHEMA)
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def begin_run(self, source):
+        with self._lock:
+            cur = self.conn.execute("INSERT INTO runs (source, started) VALUES (?, ?)", (source, _now()))
+            self.conn.commit()
+            return cur.lastrowid
+
+    def upsert(self, run_id, source, vehicles):
+        # Returns how many vehicles were skipped for having no VIN
+        skipped = 0
+        now = _now()
+        with self._lock:
+            for vehicle in vehicles:
+                vin = vehicle.get("vin")
+                if not vin:
+                    skipped += 1
+                    continue
+                price = to_number(vehicle.get("price"))
+                data = json.dumps(vehicle)
+                row = self.conn.execute("SELECT price, active FROM vehicles WHERE vin = ?", (vin,)).fetchone()
+
+                if row is None or not row["active"]:
+                    self.conn.execute("INSERT INTO changes VALUES (?, ?, 'added', NULL, ?, ?)", (run_id, vin, price, data))
+                elif row["price"] != price:
+                    self.conn.execute("INSERT INTO changes VALUES (?, ?, 'price_changed', ?, ?, ?)",
+                                      (run_id, vin, row["price"], price, data))
+
+                self.conn.execute(
+                    """INSERT INTO vehicles (vin, stock, year, make, model, trim, price, msrp, data, source,
+                                             first_seen, last_seen, last_run, active)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+                       ON CONFLICT(vin) DO UPDATE SET
+                           stock = excluded.stock, year = excluded.year, make = excluded.make,
+                           model = excluded.model, trim = excluded.trim, price = excluded.price,
+                           msrp = excluded.msrp, data = excluded.data, source = excluded.source,
+                           last_seen = excluded.last_seen, last_run = excluded.last_run, active = 1""",
+                    (vin, _text(vehicle.get("stock")), _text(vehicle.get("year")), vehicle.get("make"),
+                     vehicle.get("model"), vehicle.get("trim"), price, to_number(vehicle.get("msrp")),
+                     data, source, now, now, run_id))
+            self.conn.commit()
+        return skipped
+
+    def finish_run(self, run_id, source, complete=True):
+        with self._lock:
+            if complete:
+                removed = self.conn.execute(
+                    "SELECT vin, price, data FROM vehicles WHERE source = ? AND active = 1 AND last_run != ?",
+                    (source, run_id)).fetchall()
+                for row in removed:
+                    self.conn.execute("INSERT INTO changes VALUES (?, ?, 'removed', ?, NULL, ?)",
+                                      (run_id, row["vin"], row["price"], row["data"]))
+                self.conn.execute("UPDATE vehicles SET active = 0 WHERE source = ? AND active = 1 AND last_run != ?",
+                                  (source, run_id))
+
+            counts = {"added": 0, "removed": 0, "price_changed": 0}
+            for row in self.conn.execute("SELECT change, COUNT(*) AS n FROM changes WHERE run_id = ? GROUP BY change",
+                                         (run_id,)):
+                counts[row["change"]] = row["n"]
+            seen = self.conn.execute("SELECT COUNT(*) FROM vehicles WHERE last_run = ?", (run_id,)).fetchone()[0]
+
+            self.conn.execute(
+                """UPDATE runs SET finished = ?, complete = ?, seen = ?, added = ?, removed = ?, price_changed = ?
+                   WHERE run_id = ?""",
+                (_now(), int(complete), seen, counts["added"], counts["removed"], counts["price_changed"], run_id))
+            self.conn.commit()
+
+        counts["run_id"] = run_id
+        counts["seen"] = seen
+        counts["complete"] = complete
+        return counts
+
+    def record_run(self, vehicles, source, complete=True):
+        # One-shot helper: the whole scrape result in one call
+        run_id = self.begin_run(source)
+        self.upsert(run_id, source, vehicles)
+        return self.finish_run(run_id, source, complete)
+
+    def known_unchanged(self, vehicles):
+        # True when every vehicle is already stored as active with the same price
+        if not vehicles:
+            return False
+        with self._lock:
+            for vehicle in vehicles:
+                vin = vehicle.get("vin")
+                if not vin:
+                    return False
+                row = self.conn.execute("SELECT price, active FROM vehicles WHERE vin = ?", (vin,)).fetchone()
+                if row is None or not row["active"] or row["price"] != to_number(vehicle.get("price")):
+                    return False
+        return True
+
+    def delta_records(self, run_id):
+        records = []
+        with self._lock:
+            rows = self.conn.execute("SELECT change, vin, old_price, new_price, data FROM changes WHERE run_id = ?",
+                                     (run_id,)).fetchall()
+        for row in rows:
+            record = {"change": row["change"], "vin": row["vin"],
+                      "old_price": row["old_price"], "new_price": row["new_price"]}
+            for key, value in json.loads(row["data"] or "{}").items():
+                record.setdefault(key, value)
+            records.append(record)
+        return records
+
+    def export_delta(self, run_id, output_path):
+        # Writes only the added / removed / price-changed vehicles of one run.
+        # Returns the number of rows written (no file when there is nothing to report).
+        import pandas as pd
+        from vehicle_json import order_columns, PRIORITY_COLS
+
+        records = self.delta_records(run_id)
+        if not records:
+            return 0
+        df = order_columns(pd.DataFrame(records), DELTA_COLS + [c for c in PRIORITY_COLS if c != "vin"])
+        df.to_csv(output_path, index=False)
+        return len(df)
@@ -0,0 +1,92 @@
+import os
+
+# Lean page loads: the scraper only reads the data-vehicle attributes, so
+# images, fonts, media, analytics, ads and chat widgets are never needed.
+# Blocking them saves bandwidth and load time on every page of a crawl.
+# Browser-wide: images (block_images), autoplaying media and every host in
+# BLOCKED_DOMAINS (Chrome switches). Per tab: the font / media / image file
+# patterns (block_resources), see there for what that misses.
+
+# Not fetched by a lean tab: file types by URL pattern (Network.setBlockedURLs wildcards)
+BLOCKED_RESOURCE_PATTERNS = (
+    # images (rendering is switched off too, this also stops the downloads started by CSS / JS)
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico", "*.bmp",
+    # fonts
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    # media
+    "*.mp4", "*.webm", "*.m4v", "*.mov", "*.mp3", "*.m3u8",
+)
+
+# Third-party hosts never contacted in lean mode (their subdomains included);
+# more can be added with LEAN_BLOCK_DOMAINS="a.com,b.net" in the environment.
+# Cloudflare's challenge hosts must never end up here, or the security check can't clear.
+BLOCKED_DOMAINS = (
+    # analytics / tag managers
+    "google-analytics.com", "googletagmanager.com", "analytics.google.com", "hotjar.com", "clarity.ms",
+    "segment.com", "segment.io", "newrelic.com", "nr-data.net", "fullstory.com", "quantserve.com",
+    # ads / pixels
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "adservice.google.com",
+    "facebook.net", "connect.facebook.net", "bing.com", "bat.bing.com", "tiktok.com", "snapchat.com",
+    "criteo.com", "adroll.com", "taboola.com", "outbrain.com",
+    # dealer chat / trade-in / video widgets
+    "livechatinc.com", "carnow.com", "gubagoo.com", "gubagoo.io", "podium.com", "contactatonce.com",
+    "activengage.com", "kbb.com", "tradepending.com", "youtube.com", "ytimg.com", "vimeo.com",
+) + tuple(d.strip() for d in os.environ.get("LEAN_BLOCK_DOMAINS", "").split(",") if d.strip())
+
+# JS probe: bytes transferred for the current document and everything it loaded.
+# Cross-origin resources without a Timing-Allow-Origin header report 0, so this
+# is a lower bound; cached resources count 0 as well.
+_PAGE_TRANSFER_SCRIPT = """
+var total = 0, requests = 0;
+performance.getEntriesByType('navigation').concat(performance.getEntriesByType('resource')).forEach(function (e) {
+    total += e.transferSize || 0;
+    requests += 1;
+});
+return [total, requests];
+"""
+
+
+def host_resolver_rules(blocklist=BLOCKED_DOMAINS):
+    # Chrome switch resolving every blocked host (and its subdomains) to "not found", browser-wide
+    rules = []
+    for domain in blocklist:
+        rules += [f"MAP {domain} ~NOTFOUND", f"MAP *.{domain} ~NOTFOUND"]
+    return "--host-resolver-rules=" + ", ".join(rules)
+
+
+def driver_options(lean, blocklist=BLOCKED_DOMAINS):
+    # Extra seleniumbase Driver() arguments for a lean browser. chromium_arg is
+    # given as a list: a string would be split at the commas between the rules.
+    if not lean:
+        return {}
+    # Videos only start downloading once played (there's no browser-wide switch for fonts)
+    return {"block_images": True,
+            "chromium_arg": [host_resolver_rules(blocklist), "--autoplay-policy=user-gesture-required"]}
+
+
+def block_resources(driver, patterns=BLOCKED_RESOURCE_PATTERNS):
+    """Stop the current tab from fetching URLs matching patterns (Chrome DevTools Protocol).
+
+    Applies to the tab it is sent to only. On Cloudflare-protected sites
+    undetected mode loads each page in a new tab (window.open), so load_page
+    sends it again after the navigation: that tab's first load then still
+    gets its fonts and media, later loads in it don't. Returns False when
+    the browser has no CDP (the page then loads in full).
+    """
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": list(patterns)})
+        return True
+    except Exception:
+        return False
+
+
+def page_transfer(driver):
+    # (bytes, requests) the current page needed so far, or (None, None) when it can't tell
+    try:
+        result = driver.execute_script(_PAGE_TRANSFER_SCRIPT)
+    except Exception:
+        return None, None
+    if not isinstance(result, (list, tuple)) or len(result) != 2:
+        return None, None
+    return int(result[0]), int(result[1])
@@ -0,0 +1,90 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+def metrics_path(output_path):
+    # inventory.csv -> inventory.metrics.json
+    return os.path.splitext(output_path)[0] + ".metrics.json"
+
+
+class RunMetrics:
+    """Timers and counters for one run (a scrape, a crawl + clean, a conversion).
+
+    Timers add up wall-clock seconds per stage (total, calls, slowest call),
+    counters count things like pages or JSON cells, and info holds anything
+    else worth keeping (settings, output paths). Safe to share between the
+    scraper's worker threads. write() saves it as JSON next to an output.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.now()
+        self._start = time.monotonic()
+        self.timers = {}
+        self.counters = {}
+        self.info = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def timer(self, stage):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add_time(stage, time.monotonic() - start)
+
+    def add_time(self, stage, seconds):
+        with self._lock:
+            timer = self.timers.setdefault(stage, {"total_s": 0.0, "calls": 0, "max_s": 0.0})
+            timer["total_s"] += seconds
+            timer["calls"] += 1
+            timer["max_s"] = max(timer["max_s"], seconds)
+
+    def count(self, counter, n=1):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def add_counts(self, counts, prefix=""):
+        # e.g. the parsed / fixed / failed / skipped totals of the JSON extraction
+        for key, value in counts.items():
+            self.count(prefix + key, value)
+
+    def set(self, key, value):
+        with self._lock:
+            self.info[key] = value
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "run": self.name,
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "duration_s": round(time.monotonic() - self._start, 3),
+                "timers": {k: {"total_s": round(v["total_s"], 3), "calls": v["calls"], "max_s": round(v["max_s"], 3)}
+                           for k, v in self.timers.items()},
+                "counters": dict(self.counters),
+                "info": dict(self.info),
+            }
+
+    def write(self, output_path):
+        # Saved as <output>.metrics.json; returns that path
+        path = metrics_path(output_path)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2, default=str)
+        return path
+
+
+def summary_rows(metrics):
+    # Flat rows (stage / value) for a table in the Streamlit apps; takes to_dict() output
+    rows = [{"metric": "total run time", "value": f"{metrics['duration_s']:.1f}s"}]
+    for stage, timer in metrics["timers"].items():
+        value = f"{timer['total_s']:.2f}s"
+        if timer["calls"] > 1:
+            value += f" over {timer['calls']} calls (slowest {timer['max_s']:.2f}s)"
+        rows.append({"metric": f"time: {stage}", "value": value})
+    for counter, value in metrics["counters"].items():
+        rows.append({"metric": counter, "value": str(value)})
+    return rows
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+DEFAULT_CACHE_DIR = os.path.join(os.getcwd(), ".page_cache")
+DEFAULT_TTL = 15 * 60  # Seconds a cached page counts as fresh
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024  # Least recently used entries are evicted above this
+EVICT_TO = 0.9  # Share of max_bytes eviction frees down to, so a full cache isn't scanned on every put
+
+
+def cache_key(url):
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+class PageCache:
+    """On-disk cache of per-page payloads (extracted vehicles or raw HTML), keyed by URL.
+
+    Each entry is one JSON file named after the SHA-256 of its URL. The time it
+    was stored is kept inside the file; the file's mtime is bumped on every hit
+    and serves as the "last used" time for LRU eviction. The total size is
+    kept in memory (scanned once, on the first put), so the directory is only
+    walked again when it goes over max_bytes.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._size = None  # Bytes on disk, None until first needed
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, url):
+        key = cache_key(url)
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, url, kind="vehicles"):
+        # Returns the payload, or None when missing, stale or of another kind
+        path = self._path(url)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count(hit=False)
+            return None
+
+        if entry.get("kind") != kind or time.time() - entry.get("stored_at", 0) > self.ttl:
+            self._count(hit=False)
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count(hit=True)
+        return entry["payload"]
+
+    def put(self, url, payload, kind="vehicles"):
+        path = self._path(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        entry = {"url": url, "kind": kind, "stored_at": time.time(), "payload": payload}
+        # Write to a temp file first so a crash never leaves half an entry behind
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            if self._size is None:
+                self._size = self.size()
+            try:
+                self._size -= os.path.getsize(path)  # Replaced entry
+            except OSError:
+                pass
+            os.replace(tmp_path, path)
+            self._size += size
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield path, stat.st_size, stat.st_mtime
+
+    def size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self):
+        # Drop least recently used entries until the cache fits in max_bytes
+        # (down to EVICT_TO of it once it's over)
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total = sum(size for _, size, _ in entries)
+            target = self.max_bytes * EVICT_TO if total > self.max_bytes else self.max_bytes
+            removed = 0
+            for path, size, _ in entries:
+                if total <= target:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    removed += 1
+                except OSError:
+                    pass
+            self._size = total
+            return removed
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in list(self._entries()):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._size = None
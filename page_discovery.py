@@ -0,0 +1,134 @@
+import json
+import math
+import re
+from fetch_engine import create_session, fetch_page, is_challenge
+from html_extract import extract_vehicle_json
+from throttle import DomainRateLimiter
+
+MAX_PAGES = 200  # Upper bound for the search; the apps' own limit still applies
+PROBE_DELAY = 1.0  # Min. seconds between discovery requests to the same site
+
+# Total-results counters as dealer inventory pages tend to render them
+TOTAL_PATTERNS = (
+    r'"(?:totalCount|total_count|totalResults|resultCount|vehicleCount)"\s*:\s*"?(\d+)',
+    r'data-(?:total|total-count|results-count|vehicle-count)="(\d+)"',
+    r'\bof\s+(\d[\d,]*)\s+(?:results|vehicles|matches)\b',
+    r'\b(\d[\d,]*)\s+(?:vehicles|results|matches)\s+(?:found|available|match)',
+)
+PAGE_LINK_PATTERN = r'[?&](?:amp;)?_p=(\d+)'
+
+
+def page_url(url, page_index):
+    if "?" in url:
+        return f"{url}&_p={page_index}"
+    return f"{url}?_p={page_index}"
+
+
+def pagination_urls(base_url, page_count):
+    return [page_url(base_url, i) for i in range(page_count)]
+
+
+class DiscoveryBlocked(Exception):
+    pass
+
+
+def _vehicle_keys(html):
+    # Identity of a page's listing, to spot sites that repeat page 0 past the end
+    keys = []
+    for json_str in extract_vehicle_json(html):
+        try:
+            data = json.loads(json_str)
+        except ValueError:
+            continue
+        keys.append(data.get("vin") or data.get("stock") or json_str)
+    return tuple(keys)
+
+
+def markup_hint(html, per_page):
+    # Page count suggested by page 0 (total-results counter or pagination links), or None
+    for pattern in TOTAL_PATTERNS:
+        match = re.search(pattern, html, re.IGNORECASE)
+        if match:
+            total = int(match.group(1).replace(",", ""))
+            if total > 0 and per_page:
+                return math.ceil(total / per_page)
+
+    links = [int(i) for i in re.findall(PAGE_LINK_PATTERN, html)]
+    if links:
+        return max(links) + 1
+    return None
+
+
+def _search(has_page, lo, limit, hi=None):
+    # Last existing page index: lo exists, hi (if given) doesn't, nothing at or past limit.
+    # Exponential steps until a missing page turns up, then binary search in between.
+    step = 1
+    while hi is None:
+        probe = min(lo + step, limit - 1)
+        if probe <= lo:
+            return lo
+        if has_page(probe):
+            lo = probe
+            step *= 2
+        else:
+            hi = probe
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        if has_page(mid):
+            lo = mid
+        else:
+            hi = mid
+    return lo
+
+
+def discover_page_count(base_url, max_pages=MAX_PAGES, session=None, limiter=None):
+    """Number of real inventory pages behind base_url, found over plain HTTP.
+
+    Returns (page_count, method). method is "markup" when the hint on page 0
+    checked out, "search" when the count came from probing _p, and "fallback"
+    (page_count = max_pages) when the site blocked the probes or page 0
+    showed no vehicles over plain HTTP.
+    """
+    session = session or create_session(pool_size=1)
+    limiter = limiter or DomainRateLimiter(PROBE_DELAY)
+    first_keys = None
+    probed = {}
+
+    def fetch_keys(index):
+        limiter.wait(base_url)
+        status, html, _ = fetch_page(session, page_url(base_url, index))
+        if is_challenge(status, html):
+            raise DiscoveryBlocked(f"page {index} returned a security check (status {status})")
+        return html, _vehicle_keys(html)
+
+    def has_page(index):
+        if index not in probed:
+            _, keys = fetch_keys(index)
+            # Some sites serve page 0 again for out-of-range pages
+            probed[index] = bool(keys) and keys != first_keys
+            print(f"  Probe _p={index}: {'vehicles' if probed[index] else 'empty'}")
+        return probed[index]
+
+    try:
+        html, first_keys = fetch_keys(0)
+        if not first_keys:
+            # Rendered by JavaScript or soft-blocked: plain HTTP can't tell how many pages there are
+            print(f"Page discovery saw no vehicles on page 0 over HTTP, using {max_pages} pages.")
+            return max_pages, "fallback"
+        probed[0] = True
+
+        hint = markup_hint(html, len(first_keys))
+        if hint and 1 < hint <= max_pages:
+            # Trust the hint only once the pages around it agree
+            if has_page(hint - 1):
+                if hint == max_pages or not has_page(hint):
+                    return hint, "markup"
+                return _search(has_page, hint, max_pages) + 1, "search"
+            return _search(has_page, 0, max_pages, hi=hint - 1) + 1, "search"
+        if hint == 1 and not has_page(1):
+            return 1, "markup"
+
+        return _search(has_page, 0, max_pages) + 1, "search"
+    except DiscoveryBlocked as e:
+        print(f"Page discovery blocked ({e}), using {max_pages} pages.")
+        return max_pages, "fallback"
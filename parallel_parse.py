@@ -0,0 +1,107 @@
+import json
+import os
+from dedupe import vehicle_key
+from records import VehicleColumns
+
+# Kept free of pandas / numpy: worker processes import this module, and on
+# Windows every worker is a fresh interpreter.
+
+# Optional fast JSON decoder. Falls back to the standard library when missing.
+try:
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    orjson = None
+    loads = json.loads
+
+PARSE_PROCESSES = os.cpu_count() or 1  # Worker processes for large exports (1 parses in this process)
+PARALLEL_MIN_CELLS = 20000  # Fewer JSON cells are parsed here: starting the workers would cost more
+SHARDS_PER_PROCESS = 4  # Smaller shards keep every worker busy until the end and the progress moving
+MIN_SHARD_CELLS = 1000
+MAX_SHARD_CELLS = 10000  # Bounds the decoded vehicles waiting to be merged
+
+OUTCOMES = ("parsed", "fixed", "failed")
+
+
+def decode(text):
+    try:
+        return loads(text), "parsed"
+    except ValueError:
+        pass
+    # Sometimes quotes are escaped weirdly in CSVs (CSV double-quote escaping)
+    try:
+        return loads(text.replace('""', '"')), "fixed"
+    except ValueError:
+        return None, "failed"
+
+
+def parse_shard(cells, labels, width):
+    """Decode one shard of JSON cells.
+
+    Returns (values, counts): the decoded values in cell order and, per
+    label (0 .. width-1), how many cells were parsed / fixed / failed.
+    """
+    values = []
+    counts = [dict.fromkeys(OUTCOMES, 0) for _ in range(width)]
+    for text, label in zip(cells, labels):
+        data, outcome = decode(text)
+        counts[label][outcome] += 1
+        if data is not None:
+            values.append(data)
+    return values, counts
+
+
+def parse_shard_columns(cells, labels, width):
+    # Worker side: the shard's vehicles already in compact columns, with their
+    # dedupe keys, so the parent only copies columns (pickles small, too)
+    values, counts = parse_shard(cells, labels, width)
+    vehicles = VehicleColumns(values)
+    keys = [vehicle_key(vehicle) for vehicle in values if isinstance(vehicle, dict)]
+    return vehicles, keys, counts
+
+
+def shard_bounds(count, processes):
+    # (start, end) of each shard of count cells
+    shards = max(1, processes * SHARDS_PER_PROCESS)
+    size = min(MAX_SHARD_CELLS, max(MIN_SHARD_CELLS, -(-count // shards)))
+    return [(start, min(start + size, count)) for start in range(0, count, size)]
+
+
+def parse_cells(cells, labels, width, processes=PARSE_PROCESSES, progress=None):
+    """Decode a list of JSON cells shard by shard, yielding (values, keys, counts) per shard in order.
+
+    With processes > 1 and at least PARALLEL_MIN_CELLS cells the shards are
+    decoded in a ProcessPoolExecutor and values is a VehicleColumns with
+    keys[i] the dedupe key of its vehicle i (see parse_shard_columns). Each
+    shard is yielded as soon as it and all before it are done, so the caller
+    merges them while later shards are still being decoded. Otherwise the
+    shards are decoded here one by one, values is a list and keys is None.
+    progress(done, total) is called once the caller is done with a shard.
+    """
+    processes = max(1, processes or 1)
+    if processes == 1 or len(cells) < PARALLEL_MIN_CELLS:
+        bounds = shard_bounds(len(cells), 1)
+        for done, (start, end) in enumerate(bounds, 1):
+            values, counts = parse_shard(cells[start:end], labels[start:end], width)
+            yield values, None, counts
+            if progress:
+                progress(done, len(bounds))
+        return
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    bounds = shard_bounds(len(cells), processes)
+    with ProcessPoolExecutor(max_workers=min(processes, len(bounds))) as executor:
+        futures = [executor.submit(parse_shard_columns, cells[start:end], labels[start:end], width)
+                   for start, end in bounds]
+        try:
+            for done, future in enumerate(futures, 1):
+                yield future.result()
+                futures[done - 1] = None  # merged, free the decoded shard
+                if progress:
+                    progress(done, len(bounds))
+        finally:
+            # Stopped early (error or the caller gave up): drop the shards not started yet
+            for future in futures:
+                if future is not None:
+                    future.cancel()
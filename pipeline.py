@@ -0,0 +1,136 @@
+import queue
+import threading
+import time
+
+PIPELINE_DEPTH = 4  # Produced items waiting for a worker at most (e.g. raw HTML pages held in memory)
+PIPELINE_WORKERS = 2  # Threads running the transform stage
+
+_POLL = 0.1  # Seconds between stop checks while a stage waits on a queue
+_DONE = object()
+
+
+class Pipeline:
+    """Three overlapping stages connected by bounded queues.
+
+    produce(pipe) runs on its own thread and hands items over with
+    pipe.emit(item); emit blocks while depth items are already waiting
+    (backpressure, so memory stays bounded) and returns False once the
+    pipeline was stopped. transform(item) runs on the worker threads, and
+    consume(result) on the thread calling run(), in the order the items were
+    emitted. consume returning False stops the pipeline: the producer stops at
+    its next emit and anything still in flight is dropped.
+
+    An exception in any stage stops the pipeline and is raised from run(),
+    after every thread has finished.
+    """
+
+    def __init__(self, produce, transform, consume, workers=PIPELINE_WORKERS, depth=PIPELINE_DEPTH):
+        self.produce = produce
+        self.transform = transform
+        self.consume = consume
+        self.workers = max(1, workers)
+        self.stopped = threading.Event()
+        # Seconds the producer spent blocked on a full queue (the workers are the bottleneck)
+        self.blocked_s = 0.0
+        self._inbox = queue.Queue(maxsize=max(1, depth))
+        self._outbox = queue.Queue()
+        self._emitted = 0
+        self._consumed = 0
+        self._consumed_cond = threading.Condition()
+        self._workers_left = self.workers
+        self._workers_lock = threading.Lock()
+
+    def emit(self, item):
+        # Blocks while the queue is full; False once the pipeline is stopping
+        start = time.monotonic()
+        try:
+            while not self.stopped.is_set():
+                try:
+                    self._inbox.put((self._emitted, item), timeout=_POLL)
+                except queue.Full:
+                    continue
+                self._emitted += 1
+                return True
+            return False
+        finally:
+            self.blocked_s += time.monotonic() - start
+
+    def wait_consumed(self, count):
+        # Producer side: block until the first count items were consumed.
+        # False if the pipeline stopped instead (e.g. the consumer found the end).
+        with self._consumed_cond:
+            while self._consumed < count and not self.stopped.is_set():
+                self._consumed_cond.wait(_POLL)
+            return not self.stopped.is_set()
+
+    def stop(self):
+        self.stopped.set()
+
+    def _put_to_inbox(self, item):
+        while not self.stopped.is_set():
+            try:
+                self._inbox.put(item, timeout=_POLL)
+                return
+            except queue.Full:
+                continue
+
+    def _run_producer(self):
+        try:
+            self.produce(self)
+        except BaseException as e:
+            self._outbox.put(("error", e))
+        finally:
+            for _ in range(self.workers):
+                self._put_to_inbox(_DONE)
+
+    def _run_worker(self):
+        try:
+            while not self.stopped.is_set():
+                try:
+                    entry = self._inbox.get(timeout=_POLL)
+                except queue.Empty:
+                    continue
+                if entry is _DONE:
+                    break
+                seq, item = entry
+                self._outbox.put(("result", (seq, self.transform(item))))
+        except BaseException as e:
+            self._outbox.put(("error", e))
+        finally:
+            with self._workers_lock:
+                self._workers_left -= 1
+                if self._workers_left == 0:
+                    self._outbox.put(("done", None))
+
+    def run(self):
+        threads = [threading.Thread(target=self._run_producer, daemon=True)]
+        threads += [threading.Thread(target=self._run_worker, daemon=True) for _ in range(self.workers)]
+        for thread in threads:
+            thread.start()
+
+        pending = {}  # results that arrived ahead of their turn
+        error = None
+        try:
+            while True:
+                kind, value = self._outbox.get()
+                if kind == "error":
+                    error = value
+                    break
+                if kind == "done":
+                    break
+                seq, result = value
+                pending[seq] = result
+                while self._consumed in pending and not self.stopped.is_set():
+                    keep_going = self.consume(pending.pop(self._consumed))
+                    if keep_going is False:
+                        # Before the count moves, so a producer in wait_consumed sees the stop
+                        self.stop()
+                    with self._consumed_cond:
+                        self._consumed += 1
+                        self._consumed_cond.notify_all()
+        finally:
+            self.stop()
+            for thread in threads:
+                thread.join()
+        if error is not None:
+            raise error
@@ -0,0 +1,268 @@
+from array import array
+from itertools import repeat
+from operator import itemgetter
+
+# Known vehicle fields, each kept in its own column (same order as vehicle_json.PRIORITY_COLS)
+FIELDS = ("vin", "stock", "year", "make", "model", "trim", "price", "msrp", "ext_color", "int_color")
+# Few distinct values repeated over thousands of vehicles: stored as small integer codes
+CODED_FIELDS = ("make", "model", "trim", "ext_color", "int_color")
+# Unique per vehicle, not worth sharing
+UNIQUE_FIELDS = ("vin", "stock")
+# Longer strings are rarely repeated (descriptions, URLs) and not shared
+SHARED_STRING_MAX = 64
+# Vehicles held as dicts before they are moved into the columns, a field at a time
+FLUSH_ROWS = 2048
+
+_FIELD_SET = frozenset(FIELDS)
+_UNIQUE = frozenset(UNIQUE_FIELDS)
+
+
+class _CodedColumn:
+    # Dictionary-encoded column: codes[i] indexes values, -1 is missing
+    __slots__ = ("codes", "values", "_index")
+
+    def __init__(self):
+        self.codes = array("i")
+        self.values = []
+        self._index = {}
+
+    def code(self, value):
+        if value is None:
+            return -1
+        # Strings are looked up as they are; anything else with its type, so
+        # 1, 1.0 and True stay apart. Raises TypeError for lists / dicts.
+        key = value if type(value) is str else (type(value), value)
+        code = self._index.get(key)
+        if code is None:
+            code = len(self.values)
+            self._index[key] = code
+            self.values.append(value)
+        return code
+
+    def codes_for(self, values):
+        # Codes of a batch of values, each distinct string looked up once
+        distinct = dict.fromkeys(values)
+        if not _plain_strings(distinct):
+            return [self.code(value) for value in values]
+        for value in distinct:
+            distinct[value] = self.code(value)
+        return list(map(distinct.__getitem__, values))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        code = self.codes[i]
+        return None if code < 0 else self.values[code]
+
+    def __setitem__(self, i, value):
+        self.codes[i] = self.code(value)
+
+    def pad(self, length):
+        if len(self.codes) < length:
+            self.codes.extend(array("i", [-1]) * (length - len(self.codes)))
+
+    def to_list(self):
+        values = self.values
+        return [None if code < 0 else values[code] for code in self.codes]
+
+    def to_series(self):
+        import pandas as pd
+        try:
+            return pd.Categorical.from_codes(self.codes, pd.Index(self.values, dtype=object))
+        except (ValueError, TypeError):
+            # Values pandas can't use as categories (e.g. True next to 1)
+            return pd.Series(self.to_list(), dtype=object)
+
+
+def _plain_strings(distinct):
+    # Only strings and None: equal keys are then the same value (unlike 1, 1.0 and True)
+    return all(type(value) is str for value in distinct if value is not None)
+
+
+def _pad(column, length):
+    if isinstance(column, _CodedColumn):
+        column.pad(length)
+    elif len(column) < length:
+        column.extend([None] * (length - len(column)))
+
+
+class VehicleColumns:
+    """Vehicles stored column by column instead of one dict per vehicle.
+
+    Every field gets one column, created the first time it shows up; the
+    known FIELDS come first in the table, any other field follows as an
+    overflow column. CODED_FIELDS (make, model, colors...) are
+    dictionary-encoded so every vehicle costs a 4-byte code, and short
+    string values are shared between vehicles, so each distinct one is kept
+    only once. Appended vehicles wait in a small buffer (FLUSH_ROWS) and
+    are moved into the columns in batches. Behaves like a list of vehicle
+    dicts: append / len / index / iterate (rows come back as dicts without
+    the missing fields), and to_dataframe() builds the table straight from
+    the columns.
+    """
+
+    def __init__(self, vehicles=()):
+        # Columns are only filled up to their last value, rows past the end are missing
+        self._columns = {}
+        self._strings = {}
+        self._len = 0  # rows in the columns; the buffered vehicles come after them
+        self._buffer = []
+        self.skipped = 0  # JSON values that weren't objects
+        self.extend(vehicles)
+
+    def _share(self, values):
+        # The same values, with every short string replaced by its shared copy
+        strings = self._strings
+        try:
+            distinct = dict.fromkeys(values)
+        except TypeError:
+            distinct = None
+        if distinct is not None:
+            if len(distinct) * 2 > len(values):
+                return values  # mostly unique (URLs, descriptions...), nothing to share
+            texts = sum(type(value) is str for value in distinct)
+            if not texts:
+                return values
+            if texts == len(distinct) - (None in distinct):
+                for value in distinct:
+                    if value is not None:
+                        distinct[value] = strings.setdefault(value, value) if len(value) <= SHARED_STRING_MAX else value
+                return list(map(distinct.__getitem__, values))
+        return [strings.setdefault(v, v) if type(v) is str and len(v) <= SHARED_STRING_MAX else v
+                for v in values]
+
+    def _put(self, field, start, values):
+        # Values of field for rows start, start + 1, ... (at or past the column's end)
+        column = self._columns.get(field)
+        if column is None:
+            column = self._columns[field] = _CodedColumn() if field in CODED_FIELDS else []
+        if type(column) is _CodedColumn:
+            try:
+                codes = column.codes_for(values)
+            except TypeError:
+                # Unhashable value: this column is stored plainly from now on
+                column = self._columns[field] = column.to_list()
+            else:
+                column.pad(start)
+                column.codes.extend(codes)
+                return
+        if field not in _UNIQUE:
+            values = self._share(values)
+        _pad(column, start)
+        column.extend(values)
+
+    def _flush(self):
+        buffer = self._buffer
+        if not buffer:
+            return
+        self._buffer = []
+        fields = {}
+        for vehicle in buffer:
+            fields.update(vehicle)
+        for field in fields:
+            self._put(field, self._len, list(map(dict.get, buffer, repeat(field))))
+        self._len += len(buffer)
+
+    def append(self, vehicle):
+        if not isinstance(vehicle, dict):
+            self.skipped += 1
+            return
+        self._buffer.append(vehicle)
+        if len(self._buffer) >= FLUSH_ROWS:
+            self._flush()
+
+    def extend(self, vehicles):
+        for vehicle in vehicles:
+            self.append(vehicle)
+
+    def extend_rows(self, other, rows=None):
+        # Appends the vehicles of another VehicleColumns (or only those at the
+        # given positions) a column at a time, without going through dicts
+        self._flush()
+        other._flush()
+        count = other._len if rows is None else len(rows)
+        pick = itemgetter(*rows) if rows is not None and len(rows) > 1 else None
+        for field, column in other._columns.items():
+            values = column.to_list() if type(column) is _CodedColumn else column
+            if len(values) < other._len:
+                values = values + [None] * (other._len - len(values))
+            if rows is None:
+                values = list(values)
+            elif pick is not None:
+                values = list(pick(values))
+            else:
+                values = [values[row] for row in rows]
+            self._put(field, self._len, values)
+        self._len += count
+        self.skipped += other.skipped
+
+    def __getstate__(self):
+        # Sent between processes (see parallel_parse) without the buffer or the sharing table
+        self._flush()
+        return dict(self.__dict__, _strings={})
+
+    def __len__(self):
+        return self._len + len(self._buffer)
+
+    def _row_index(self, i):
+        self._flush()
+        if i < 0:
+            i += self._len
+        if not 0 <= i < self._len:
+            raise IndexError("vehicle index out of range")
+        return i
+
+    def _row(self, i, columns):
+        row = {}
+        for field, column in columns:
+            if i < len(column):
+                value = column[i]
+                if value is not None:
+                    row[field] = value
+        return row
+
+    def _ordered_columns(self):
+        return [(field, self._columns[field]) for field in self.columns()]
+
+    def __getitem__(self, i):
+        return self._row(self._row_index(i), self._ordered_columns())
+
+    def __setitem__(self, i, vehicle):
+        # Replace a whole vehicle (e.g. a later copy of it, see dedupe.Deduper)
+        i = self._row_index(i)
+        for field, column in list(self._columns.items()):
+            if field not in vehicle and i < len(column):
+                column[i] = None
+        for field, value in vehicle.items():
+            column = self._columns.get(field)
+            if column is not None and i < len(column):
+                try:
+                    column[i] = value
+                    continue
+                except TypeError:
+                    column = self._columns[field] = column.to_list()
+                    column[i] = value
+                    continue
+            self._put(field, i, [value])
+
+    def __iter__(self):
+        columns = self._ordered_columns()
+        for i in range(self._len):
+            yield self._row(i, columns)
+
+    def columns(self):
+        self._flush()
+        # Known fields first, then the others in the order they first appeared
+        return ([field for field in FIELDS if field in self._columns]
+                + [field for field in self._columns if field not in _FIELD_SET])
+
+    def to_dataframe(self):
+        import pandas as pd
+
+        data = {}
+        for field in self.columns():
+            column = self._columns[field]
+            _pad(column, self._len)
+            data[field] = column.to_series() if isinstance(column, _CodedColumn) else column
+        return pd.DataFrame(data, index=pd.RangeIndex(self._len))
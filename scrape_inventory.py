@@ -1,134 +1,721 @@
-from seleniumbase import Driver
-from bs4 import BeautifulSoup
-import pandas as pd
+import json
 import time
 import random
 import os
+import threading
+import queue
 import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from throttle import DomainRateLimiter
+from html_extract import extract_vehicle_json
+from crawl_journal import CrawlJournal, DEFAULT_JOURNAL_PATH
+from page_discovery import page_url
+from metrics import RunMetrics
+from pipeline import Pipeline, PIPELINE_DEPTH
+from dedupe import DEFAULT_POLICY, Deduper, check_policy, vehicle_key
+from records import VehicleColumns
+from fetch_engine import create_session, fetch_pages, is_challenge, session_from_driver
+from lean_browser import BLOCKED_DOMAINS, block_resources, driver_options, page_transfer
+from enrich import ENRICH_CONCURRENCY, detail_cache, enrich_vehicles
 
-def scrape_cartown(url="https://www.cartownlexington.com/new-vehicles/", scrape_all=False):
-    print("Initializing Browser (Undetected Mode)...")
-    driver = Driver(uc=True, headless=False)
-    
+POLITE_DELAY = 2  # Minimum seconds between two page loads on the same domain
+DEFAULT_WORKERS = 1  # Browser instances used when scraping all pages
+WAIT_TIMEOUT = 20  # Max seconds to wait for a page to show vehicles / no results
+WAIT_POLL = 0.25  # Seconds between two checks while waiting
+EMPTY_GRACE = 3  # Seconds a fully loaded page may stay empty before we call it "no results"
+HTML_ENGINE = "auto"  # data-vehicle extractor: auto, lxml, stream, strainer or soup (see html_extract)
+PARSE_WORKERS = 1  # Threads parsing pages while the browser loads the next one (single-browser runs; parsing holds the GIL)
+LEAN_BROWSER = False  # Block images, fonts, media and trackers in the browser (see lean_browser)
+LEAN_HEADLESS = True  # Lean browsers run headless; set False if the security check keeps failing headless
+
+VEHICLE_SELECTOR = ".result-wrap[data-vehicle]"
+NO_RESULTS_SELECTOR = ".no-results, .noResults, .no-vehicles, .results-empty"
+CHALLENGE_SELECTOR = '#challenge-form, #cf-challenge-running, iframe[src*="challenges.cloudflare.com"]'
+
+# Creating several undetected drivers at once races on the chromedriver patching
+_driver_start_lock = threading.Lock()
+
+
+def create_driver(headless=None, lean=LEAN_BROWSER, blocklist=BLOCKED_DOMAINS):
+    # lean: no images, fonts, media, nor any host of blocklist (see lean_browser);
+    # headless by default then (LEAN_HEADLESS), a full browser shows its window by default
+    # seleniumbase is imported here, it is slow to load and HTTP / cached runs never need it
+    from seleniumbase import Driver
+    if headless is None:
+        headless = lean and LEAN_HEADLESS
+    with _driver_start_lock:
+        driver = Driver(uc=True, headless=headless, **driver_options(lean, blocklist))
+    # load_page blocks the resource types again around every page load (tabs can change)
+    driver.lean = lean and block_resources(driver)
+    return driver
+
+
+# JS probe run on every poll: which of the things we wait for is on the page?
+_PAGE_STATE_SCRIPT = """
+if (document.querySelector('%s')) return 'vehicles';
+if (document.querySelector('%s')) return 'no_results';
+var title = document.title || '';
+if (title.indexOf('Just a moment') >= 0 || document.querySelector('%s')) return 'challenge';
+return document.readyState === 'complete' ? 'loaded' : null;
+""" % (VEHICLE_SELECTOR, NO_RESULTS_SELECTOR, CHALLENGE_SELECTOR)
+
+
+def wait_for_inventory(driver, timeout=WAIT_TIMEOUT, stop_on_challenge=True):
+    # Poll until vehicles, a "No Results" marker or a Cloudflare challenge shows up.
+    # A page that finished loading but stays empty for EMPTY_GRACE seconds counts as no results.
+    deadline = time.monotonic() + timeout
+    loaded_since = None
+    while True:
+        state = driver.execute_script(_PAGE_STATE_SCRIPT)
+        if state in ("vehicles", "no_results"):
+            return state
+        if state == "challenge" and stop_on_challenge:
+            return state
+        if state == "loaded":
+            loaded_since = loaded_since or time.monotonic()
+            if time.monotonic() - loaded_since >= EMPTY_GRACE:
+                return "no_results"
+        else:
+            loaded_since = None
+        if time.monotonic() >= deadline:
+            return "timeout"
+        time.sleep(WAIT_POLL)
+
+
+def parse_vehicles(html, engine=None, metrics=None):
+    vehicles = []
+    failed = 0
+    for json_str in extract_vehicle_json(html, engine or HTML_ENGINE):
+        try:
+            vehicles.append(json.loads(json_str))
+        except json.JSONDecodeError:
+            failed += 1
+    if metrics is not None:
+        metrics.count("json_parsed", len(vehicles))
+        metrics.count("json_failed", failed)
+    return vehicles
+
+
+def load_page(driver, target_url, wait_timeout=WAIT_TIMEOUT, metrics=None):
+    # Returns (page HTML once the inventory showed up, timing record for that page)
+    timing = {"url": target_url}
+    lean = getattr(driver, "lean", False)
+    if lean:
+        block_resources(driver)
+
+    start = time.monotonic()
+    driver.get(target_url)
+    timing["nav_s"] = time.monotonic() - start
+    if lean:
+        # On Cloudflare sites undetected mode opens the page in a new tab, which
+        # the block above never reached; cover whatever that tab loads from here on
+        block_resources(driver)
+
+    # Smart Wait
+    # Wait for either the inventory container OR a "No Results" message
+    start = time.monotonic()
+    state = wait_for_inventory(driver, wait_timeout)
+    if state == "challenge":
+        # Undetected mode usually clears the challenge by itself, give it the remaining time
+        print("Cloudflare challenge detected, waiting for it to clear...")
+        if metrics is not None:
+            metrics.count("challenges")
+        remaining = max(0, wait_timeout - (time.monotonic() - start))
+        state = wait_for_inventory(driver, remaining, stop_on_challenge=False)
+    timing["wait_s"] = time.monotonic() - start
+    timing["state"] = state
+    transferred, request_count = page_transfer(driver)
+    if transferred is not None:
+        timing["bytes"] = transferred
+        timing["requests"] = request_count
+
+    return driver.page_source, timing
+
+
+def parse_page(html, timing, metrics=None):
+    # Vehicles of a page from load_page; adds the parse time to its timing record
+    start = time.monotonic()
+    vehicles = parse_vehicles(html, metrics=metrics)
+    timing["parse_s"] = time.monotonic() - start
+    timing["vehicles"] = len(vehicles)
+    return vehicles
+
+
+def scrape_page(driver, target_url, wait_timeout=WAIT_TIMEOUT, metrics=None):
+    # Returns (vehicles found on one page, timing record for that page)
+    html, timing = load_page(driver, target_url, wait_timeout, metrics)
+    return parse_page(html, timing, metrics), timing
+
+
+def close_driver(driver):
+    # Quitting a browser that already crashed raises; that shouldn't hide the run's result
     try:
-        vehicles = []
+        driver.quit()
+    except Exception as e:
+        print(f"Could not close the browser cleanly: {e}")
+
+
+def print_timing_summary(timings):
+    if not timings:
+        return
+    print("--- Page Timings (seconds) ---")
+    for key in ("nav_s", "wait_s", "parse_s"):
+        values = [t[key] for t in timings if key in t]
+        if values:
+            print(f"{key[:-2]:>6}: total {sum(values):.2f}, avg {sum(values) / len(values):.2f}, max {max(values):.2f}")
+    sizes = [t["bytes"] for t in timings if "bytes" in t]
+    if sizes:
+        print(f"{'KB':>6}: total {sum(sizes) / 1024:.0f}, avg {sum(sizes) / len(sizes) / 1024:.0f}, "
+              f"max {max(sizes) / 1024:.0f} (transferred per page)")
+
+
+class ScrapeRun:
+    # Settings and bookkeeping shared by the page loops of one scrape_cartown call
+    def __init__(self, url, scrape_all, limiter, driver_factory, wait_timeout, stop_check=None, cache=None,
+                 journal=None, resumed=None, on_page=None, metrics=None, driver_release=None):
+        self.url = url
+        self.scrape_all = scrape_all
+        self.limiter = limiter
+        self.driver_factory = driver_factory
+        # driver_release(driver) hands a browser back when a loop is done with it
+        # (quits it by default; BrowserPool.release keeps it warm instead)
+        self.driver_release = driver_release or close_driver
+        self.wait_timeout = wait_timeout
+        # stop_check(page_vehicles) -> True ends paging early (incremental mode)
+        self.stop_check = stop_check
+        # PageCache of extracted vehicles per page URL (optional)
+        self.cache = cache
+        # CrawlJournal checkpoint, and the pages restored from it when resuming
+        self.journal = journal
+        self.resumed = resumed or {}
+        self.timings = []
+        self.stopped_early = False
+        # Set when a page failed, the checkpoint then stays open for resume=True
+        self.failed = False
+        # on_page(event) is called as soon as a page's vehicles are in (live progress)
+        self.on_page = on_page
+        # RunMetrics collecting stage timers and counters for this run
+        self.metrics = metrics or RunMetrics("scrape")
+        self.pages_found = 0
+        self.vehicles_found = 0
+        self._live_keys = set()
+        self._progress_lock = threading.Lock()
+
+    def reuse_page(self, target_url, page_index):
+        # (vehicles, "checkpoint" / "cache") for a page we don't need to fetch, or (None, None)
+        source = None
+        page_vehicles = None
+        if page_index in self.resumed:
+            page_vehicles, source = self.resumed[page_index], "checkpoint"
+        elif self.cache is not None:
+            page_vehicles, source = self.cache.get(target_url), "cache"
+        if not page_vehicles:
+            return None, None
+        self.metrics.count(f"pages_from_{source}")
+        self.timings.append({"url": target_url, "page_index": page_index, "state": source,
+                             "nav_s": 0.0, "wait_s": 0.0, "parse_s": 0.0, "vehicles": len(page_vehicles)})
+        if source == "cache" and self.journal is not None:
+            self.journal.record_page(self.url, page_index, page_vehicles)
+        return page_vehicles, source
+
+    def start_driver(self):
+        with self.metrics.timer("browser_start"):
+            return self.driver_factory()
+
+    def release_driver(self, driver):
+        try:
+            self.driver_release(driver)
+        except Exception as e:
+            print(f"Could not hand back the browser: {e}")
+
+    def record_timing(self, timing):
+        self.timings.append(timing)
+        self.metrics.count("pages_fetched")
+        for key in ("nav_s", "wait_s", "parse_s"):
+            if key in timing:
+                self.metrics.add_time(key[:-2], timing[key])
+        if "bytes" in timing:
+            self.metrics.count("bytes_transferred", timing["bytes"])
+            self.metrics.count("requests", timing["requests"])
+
+    def page_error(self, page_index, error):
+        self.failed = True
+        self.metrics.count("page_errors")
+        self.metrics.set("last_error", f"page {page_index}: {error}")
+
+    def page_done(self, target_url, page_index, page_vehicles):
+        # Empty pages are not kept, the inventory may have grown by the next run
+        if not page_vehicles:
+            return
+        if self.cache is not None:
+            self.cache.put(target_url, page_vehicles)
+        if self.journal is not None:
+            self.journal.record_page(self.url, page_index, page_vehicles)
+
+    def page_found(self, page_index, page_vehicles, source="live"):
+        if self.on_page is None:
+            return
+        with self._progress_lock:
+            # Only vehicles not seen on an earlier page, so featured cars repeated
+            # on every page don't inflate the running total
+            new_vehicles = []
+            for vehicle in page_vehicles:
+                key = vehicle_key(vehicle)
+                if key is None or key not in self._live_keys:
+                    self._live_keys.add(key)
+                    new_vehicles.append(vehicle)
+            self.pages_found += 1
+            self.vehicles_found += len(new_vehicles)
+            event = {"type": "page", "page_index": page_index, "source": source, "vehicles": new_vehicles,
+                     "pages": self.pages_found, "total": self.vehicles_found}
+        self.on_page(event)
+
+    def should_stop(self, page_vehicles):
+        if self.stop_check is not None and self.stop_check(page_vehicles):
+            self.stopped_early = True
+            return True
+        return False
+
+
+def _scrape_sequential(driver, run):
+    # driver: callable returning the (lazily started) browser.
+    # Runs as a pipeline (see pipeline.Pipeline): the browser thread only
+    # navigates and grabs the HTML, parse workers turn it into vehicles, and
+    # this thread records the pages in order (checkpoint, cache, live events).
+    # The browser loads the next page while the previous one is parsed.
+    vehicles = []
+
+    def fetch(pipe):
         page_index = 0 # _p parameter starts at 0 for page 1 usually, or we iterate until empty
-        
         while True:
             # Construct URL for specific page
             # If scrape_all is False, we just use the base URL (which is effectively page 0)
-            target_url = url
-            if scrape_all:
-                if "?" in url:
-                    target_url = f"{url}&_p={page_index}"
-                else:
-                    target_url = f"{url}?_p={page_index}"
-            
+            target_url = page_url(run.url, page_index) if run.scrape_all else run.url
+
             print(f"--- Scraping Page (Index {page_index}) ---")
-            print(f"Navigating to {target_url}...")
-            
-            driver.get(target_url)
-            
-            # Smart Wait
-            # Wait for either the inventory container OR a "No Results" message
-            try:
-                print("Waiting for data to load...")
-                time.sleep(5) # Base wait for Cloudflare/Animation
-                
-                # Check 1: Did we land on a valid page with vehicles?
-                soup = BeautifulSoup(driver.page_source, "html.parser")
-                vehicle_wraps = soup.select(".result-wrap")
-                
-                if not vehicle_wraps:
-                    # Check 2: Is there a "No Results" indicator?
-                    # or did we just fail to load?
-                    # If we are on page_index > 0 and find no vehicles, we assume we are done.
-                    if page_index > 0 and scrape_all:
-                        print("No vehicles found on this page. Reached end of inventory.")
+            page = {"page_index": page_index, "url": target_url}
+            page_vehicles, source = run.reuse_page(target_url, page_index)
+            if page_vehicles is not None:
+                print(f"Using {source} results for this page.")
+                page.update(vehicles=page_vehicles, source=source)
+            else:
+                print(f"Navigating to {target_url}...")
+                run.limiter.wait(target_url)
+                try:
+                    page["html"], page["timing"] = load_page(driver(), target_url, run.wait_timeout, run.metrics)
+                except Exception as e:
+                    print(f"Error extracting data on page {page_index}: {e}")
+                    run.page_error(page_index, e)
+                    return
+
+            if not pipe.emit(page) or not run.scrape_all:
+                return
+            # A page that never showed vehicles is most likely the end, and in
+            # incremental runs any page may be the stop point: wait for its
+            # parse instead of loading pages past it
+            if run.stop_check is not None or ("timing" in page and page["timing"]["state"] != "vehicles"):
+                if not pipe.wait_consumed(page_index + 1):
+                    return
+            page_index += 1
+
+    def parse(page):
+        if "html" in page:
+            page["vehicles"] = parse_page(page.pop("html"), page["timing"], run.metrics)
+        return page
+
+    def collect(page):
+        page_index = page["page_index"]
+        page_vehicles = page["vehicles"]
+        if "timing" in page:
+            page["timing"]["page_index"] = page_index
+            run.record_timing(page["timing"])
+            run.page_done(page["url"], page_index, page_vehicles)
+
+        if not page_vehicles:
+            # If we are on page_index > 0 and find no vehicles, we assume we are done.
+            if page_index > 0 and run.scrape_all:
+                print("No vehicles found on this page. Reached end of inventory.")
+            else:
+                print("WARNING: No vehicles found on the first page. Site structure might have changed or Cloudflare blocked loading.")
+            return False
+
+        vehicles.extend(page_vehicles)
+        run.page_found(page_index, page_vehicles, page.get("source", "live"))
+        print(f"Found {len(page_vehicles)} vehicles on page {page_index}. Total so far: {len(vehicles)}")
+
+        if not run.scrape_all:
+            print("Scrape All is disabled. Stopping after first page.")
+            return False
+
+        if run.should_stop(page_vehicles):
+            print("Every vehicle on this page is already known and unchanged. Stopping early.")
+            return False
+        return True
+
+    pipe = Pipeline(fetch, parse, collect, workers=PARSE_WORKERS, depth=PIPELINE_DEPTH)
+    pipe.run()
+    run.metrics.add_time("fetch_blocked", pipe.blocked_s)
+    return vehicles
+
+
+def _scrape_parallel(run, workers):
+    # Page indices are handed out one at a time to the worker browsers.
+    # The first empty (or failing) page marks the end of the inventory for
+    # everyone, so no worker launches pages past it.
+    state = {"next_page": 0, "end_page": float("inf")}
+    state_lock = threading.Lock()
+    results = {}
+
+    def claim_page():
+        with state_lock:
+            page_index = state["next_page"]
+            if page_index >= state["end_page"]:
+                return None
+            state["next_page"] += 1
+            return page_index
+
+    def mark_end(page_index):
+        with state_lock:
+            state["end_page"] = min(state["end_page"], page_index)
+
+    def worker(worker_id):
+        # The browser is only started once a page actually misses the cache
+        driver = None
+        try:
+            while True:
+                page_index = claim_page()
+                if page_index is None:
+                    return
+                target_url = page_url(run.url, page_index)
+                page_vehicles, source = run.reuse_page(target_url, page_index)
+                if page_vehicles is not None:
+                    print(f"[Worker {worker_id}] Using {source} results for page {page_index}.")
+                else:
+                    try:
+                        # A browser that won't start ends this worker like a failing page, the others' pages are kept
+                        if driver is None:
+                            driver = run.start_driver()
+                        run.limiter.wait(target_url)
+                        print(f"[Worker {worker_id}] Navigating to {target_url}...")
+                        page_vehicles, timing = scrape_page(driver, target_url, run.wait_timeout, run.metrics)
+                    except Exception as e:
+                        print(f"[Worker {worker_id}] Error extracting data on page {page_index}: {e}")
+                        run.page_error(page_index, e)
+                        mark_end(page_index)
+                        return
+                    timing["page_index"] = page_index
+                    timing["worker"] = worker_id
+                    run.record_timing(timing)
+                    run.page_done(target_url, page_index, page_vehicles)
+                if not page_vehicles:
+                    print(f"[Worker {worker_id}] No vehicles on page {page_index}. Reached end of inventory.")
+                    mark_end(page_index)
+                    return
+                results[page_index] = page_vehicles
+                run.page_found(page_index, page_vehicles, source or "live")
+                print(f"[Worker {worker_id}] Found {len(page_vehicles)} vehicles on page {page_index}.")
+                if run.should_stop(page_vehicles):
+                    print(f"[Worker {worker_id}] Page {page_index} holds only known, unchanged vehicles. Stopping early.")
+                    mark_end(page_index + 1)
+        finally:
+            if driver is not None:
+                run.release_driver(driver)
+
+    print(f"Starting {workers} browser workers...")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(worker, i + 1) for i in range(workers)]
+        for future in futures:
+            future.result()
+
+    if 0 not in results:
+        print("WARNING: No vehicles found on the first page. Site structure might have changed or Cloudflare blocked loading.")
+
+    # Merge in page order, ignoring anything past the detected end
+    vehicles = []
+    for page_index in sorted(results):
+        if page_index < state["end_page"]:
+            vehicles.extend(results[page_index])
+    return vehicles
+
+
+def _scrape_http(run, concurrency):
+    # Pages are fetched over a pooled HTTP session, several at a time.
+    # Only pages that come back as a challenge go through the browser, which is
+    # started on first need; its cookies are then handed back to the session.
+    session = create_session(pool_size=max(1, concurrency))
+    batch_size = max(1, concurrency) if run.scrape_all else 1
+    driver = None
+    vehicles = []
+    page_index = 0
+
+    try:
+        while True:
+            batch = list(range(page_index, page_index + batch_size))
+            urls = [page_url(run.url, i) if run.scrape_all else run.url for i in batch]
+            cached = {target_url: run.reuse_page(target_url, index) for index, target_url in zip(batch, urls)}
+            misses = [target_url for target_url in urls if cached[target_url][0] is None]
+            responses = fetch_pages(session, misses, concurrency, run.limiter) if misses else {}
+
+            reached_end = False
+            for index, target_url in zip(batch, urls):
+                page_vehicles, source = cached[target_url]
+                if page_vehicles is not None:
+                    print(f"Page {index}: using {source} results.")
+                    vehicles.extend(page_vehicles)
+                    run.page_found(index, page_vehicles, source)
+                    if run.scrape_all and run.should_stop(page_vehicles):
+                        reached_end = True
+                        break
+                    continue
+
+                status, html, fetch_s = responses[target_url]
+                if is_challenge(status, html):
+                    print(f"Page {index} is challenged (HTTP {status}), handing it to the browser...")
+                    run.metrics.count("pages_via_browser")
+                    run.limiter.wait(target_url)
+                    try:
+                        if driver is None:
+                            print("Initializing Browser (Undetected Mode)...")
+                            driver = run.start_driver()
+                        page_vehicles, timing = scrape_page(driver, target_url, run.wait_timeout, run.metrics)
+                    except Exception as e:
+                        # Keep the pages already collected, like the browser engines do
+                        print(f"Error extracting data on page {index}: {e}")
+                        run.page_error(index, e)
+                        reached_end = True
                         break
+                    timing["engine"] = "browser"
+                    session_from_driver(driver, session)
+                else:
+                    timing = {"url": target_url, "nav_s": fetch_s, "wait_s": 0.0, "state": f"http {status}", "engine": "http"}
+                    start = time.monotonic()
+                    page_vehicles = parse_vehicles(html, metrics=run.metrics)
+                    timing["parse_s"] = time.monotonic() - start
+                    timing["vehicles"] = len(page_vehicles)
+                timing["page_index"] = index
+                run.record_timing(timing)
+                run.page_done(target_url, index, page_vehicles)
+
+                if not page_vehicles:
+                    if index > 0 and run.scrape_all:
+                        print(f"No vehicles found on page {index}. Reached end of inventory.")
                     else:
                         print("WARNING: No vehicles found on the first page. Site structure might have changed or Cloudflare blocked loading.")
-                        break
-                
-                # Extract Data
-                import json
-                new_vehicles_count = 0
-                for wrap in vehicle_wraps:
-                    json_str = wrap.get("data-vehicle")
-                    if json_str:
-                        try:
-                            data = json.loads(json_str)
-                            # Helper for clean price
-                            if 'price' in data:
-                                data['price'] = str(data['price'])
-                            vehicles.append(data)
-                            new_vehicles_count += 1
-                        except json.JSONDecodeError:
-                            continue
-                
-                print(f"Found {new_vehicles_count} vehicles on this page. Total so far: {len(vehicles)}")
-                
-                # Verify if we actually got new data
-                if new_vehicles_count == 0 and page_index > 0:
-                    print("Page loaded but no valid vehicle data found. Stopping.")
+                    reached_end = True
                     break
 
-            except Exception as e:
-                print(f"Error extracting data on page {page_index}: {e}")
-                break
-            
-            if not scrape_all:
-                print("Scrape All is disabled. Stopping after first page.")
+                vehicles.extend(page_vehicles)
+                run.page_found(index, page_vehicles)
+                print(f"Page {index}: {len(page_vehicles)} vehicles. Total so far: {len(vehicles)}")
+
+                if run.scrape_all and run.should_stop(page_vehicles):
+                    print(f"Every vehicle on page {index} is already known and unchanged. Stopping early.")
+                    reached_end = True
+                    break
+
+            if reached_end or not run.scrape_all:
                 break
-                
-            page_index += 1
-            time.sleep(2) # Polite delay
-                
+            page_index += batch_size
+    finally:
+        session.close()
+        if driver is not None:
+            print("Releasing browser...")
+            run.release_driver(driver)
+
+    return vehicles
+
+
+def build_dataframe(vehicles):
+    import pandas as pd
+    from inventory_schema import normalize_types
+
+    df = vehicles.to_dataframe() if isinstance(vehicles, VehicleColumns) else pd.DataFrame(vehicles)
+    # Reorder and rename columns
+    column_mapping = {
+        'year': 'Year',
+        'make': 'Make',
+        'model': 'Model',
+        'trim': 'Trim',
+        'vin': 'VIN',
+        'stock': 'Stock #',
+        'price': 'Final Price',
+        'msrp': 'MSRP',
+        'ext_color': 'Exterior Color',
+        'int_color': 'Interior Color'
+    }
+
+    # Rename columns that exist
+    df = df.rename(columns=column_mapping)
+
+    # Select columns to output
+    desired_order = ['Year', 'Make', 'Model', 'Trim', 'VIN', 'Stock #', 'MSRP', 'Final Price', 'Exterior Color', 'Interior Color']
+    existing_cols = [c for c in desired_order if c in df.columns]
+    extra_cols = [c for c in df.columns if c not in existing_cols]
+
+    # Typed columns: numeric prices/year, categorical make/model/colors
+    return normalize_types(df[existing_cols + extra_cols])
+
+
+def scrape_cartown(url="https://www.cartownlexington.com/new-vehicles/", scrape_all=False,
+                   workers=DEFAULT_WORKERS, rate_limit=POLITE_DELAY, driver_factory=create_driver,
+                   wait_timeout=WAIT_TIMEOUT, engine="browser", store=None, incremental=False, cache=None,
+                   checkpoint=DEFAULT_JOURNAL_PATH, resume=False, save_backup=True, on_page=None, metrics=None,
+                   driver_release=None, dedupe=DEFAULT_POLICY, enrich=False):
+    # engine="browser": every page through undetected Chrome (workers = browsers)
+    # engine="http": pooled HTTP first, browser only for challenged pages (workers = concurrent requests)
+    # store: InventoryStore to upsert into; incremental=True stops paging at the
+    # first page whose vehicles are all already stored unchanged
+    # cache: PageCache; pages still fresh in it are not fetched again (reruns / resumes)
+    # checkpoint: JSONL journal written after every page of a scrape_all crawl;
+    # resume=True continues the last unfinished crawl of this url from it
+    # save_backup=False skips writing inventory.csv / .json / .parquet (batch runs)
+    # on_page(event): called per page with {"page_index", "vehicles", "pages", "total", ...};
+    # may come from worker threads (see iter_scrape for a single-threaded consumer)
+    # metrics: RunMetrics to fill (one is created otherwise); its summary ends up in
+    # df.attrs["metrics"] and, with save_backup, in inventory.metrics.json
+    # df.attrs["complete"] is True when every page of a scrape_all crawl was visited
+    # driver_release(driver): called instead of quitting each browser; with a
+    # BrowserPool pass driver_factory=pool.acquire, driver_release=pool.release
+    # dedupe: policy for vehicles found on several pages (see dedupe.POLICIES), None keeps all
+    # enrich=True also visits every vehicle's detail page for the fields listings
+    # don't show (see enrich.py); details are cached per VIN for a day
+    if dedupe:
+        check_policy(dedupe)
+    metrics = metrics or RunMetrics("scrape")
+    metrics.set("url", url)
+    metrics.set("engine", engine)
+    metrics.set("workers", workers)
+    metrics.set("scrape_all", scrape_all)
+    stop_check = store.known_unchanged if (store is not None and incremental) else None
+    journal = CrawlJournal(checkpoint) if (scrape_all and checkpoint) else None
+    resumed = journal.start(url, resume) if journal is not None else {}
+    if resumed:
+        print(f"Resuming from checkpoint: {len(resumed)} pages already done (last index {max(resumed)}).")
+    run = ScrapeRun(url, scrape_all, DomainRateLimiter(rate_limit), driver_factory, wait_timeout, stop_check, cache,
+                    journal, resumed, on_page, metrics, driver_release)
+    parallel = scrape_all and workers > 1
+
+    driver = None
+    try:
+        if engine == "http":
+            vehicles = _scrape_http(run, workers)
+        elif parallel:
+            vehicles = _scrape_parallel(run, workers)
+        else:
+            def get_driver():
+                # Started on first use, a fully cached run never opens Chrome
+                nonlocal driver
+                if driver is None:
+                    print("Initializing Browser (Undetected Mode)...")
+                    driver = run.start_driver()
+                return driver
+            vehicles = _scrape_sequential(get_driver, run)
+
+        # Into compact columns (the DataFrame is built from them), repeats dropped
+        deduper = Deduper(dedupe, VehicleColumns()).add_all(vehicles)
+        vehicles = deduper.vehicles
+        metrics.count("duplicates", deduper.duplicates)
+        if deduper.duplicates:
+            print(f"Dropped {deduper.duplicates} duplicate vehicles (listed on more than one page).")
+        if enrich and len(vehicles) > 0:
+            # Over HTTP, with the cookies the browser earned if one was opened.
+            # A failure here keeps the scraped vehicles as they are.
+            session = create_session(ENRICH_CONCURRENCY)
+            try:
+                if driver is not None:
+                    session_from_driver(driver, session)
+                with metrics.timer("enrich"):
+                    enrich_vehicles(vehicles, url, session=session, cache=detail_cache(), metrics=metrics)
+            except Exception as e:
+                print(f"Detail enrichment failed, keeping the listing data: {e}")
+                metrics.set("enrich_error", str(e))
+            finally:
+                session.close()
         print(f"Scraping complete. Found {len(vehicles)} total vehicles.")
-        
+        metrics.count("vehicles", len(vehicles))
+        metrics.set("stopped_early", run.stopped_early)
+        if journal is not None and not run.failed:
+            journal.mark_done(url)
+        run.timings.sort(key=lambda t: t["page_index"])
+        print_timing_summary(run.timings)
+        if cache is not None:
+            print(f"Page cache: {cache.hits} hits, {cache.misses} misses.")
+
         if len(vehicles) > 0:
-            df = pd.DataFrame(vehicles)
-            # Reorder and rename columns
-            column_mapping = {
-                'year': 'Year',
-                'make': 'Make',
-                'model': 'Model',
-                'trim': 'Trim',
-                'vin': 'VIN',
-                'stock': 'Stock #',
-                'price': 'Final Price',
-                'msrp': 'MSRP',
-                'ext_color': 'Exterior Color',
-                'int_color': 'Interior Color'
-            }
-            
-            # Rename columns that exist
-            df = df.rename(columns=column_mapping)
-            
-            # Select columns to output
-            desired_order = ['Year', 'Make', 'Model', 'Trim', 'VIN', 'Stock #', 'MSRP', 'Final Price', 'Exterior Color', 'Interior Color']
-            existing_cols = [c for c in desired_order if c in df.columns]
-            extra_cols = [c for c in df.columns if c not in existing_cols]
-            
-            df = df[existing_cols + extra_cols]
-            
+            with metrics.timer("dataframe"):
+                df = build_dataframe(vehicles)
+            df.attrs["page_timings"] = run.timings
+            # Every page visited (no early stop, no failed page): only then can unseen vehicles count as removed
+            complete = scrape_all and not run.stopped_early and not run.failed
+            df.attrs["complete"] = complete
+
             # Save local backup
-            df.to_csv("inventory.csv", index=False)
-            df.to_json("inventory.json", orient="records", indent=4)
-            
+            if save_backup:
+                from inventory_schema import write_typed
+                with metrics.timer("write"):
+                    df.to_csv("inventory.csv", index=False)
+                    df.to_json("inventory.json", orient="records", indent=4)
+                    try:
+                        write_typed(df, "inventory.parquet")
+                    except ImportError as e:
+                        print(f"Skipping inventory.parquet: {e}")
+
+            if store is not None:
+                with metrics.timer("store"):
+                    delta = store.record_run(vehicles, source=url, complete=complete)
+                print(f"Inventory store: {delta['added']} added, {delta['removed']} removed, "
+                      f"{delta['price_changed']} price changes.")
+                if save_backup and store.export_delta(delta["run_id"], "inventory_delta.csv"):
+                    print("Saved changes to inventory_delta.csv")
+                df.attrs["delta"] = delta
+
+            df.attrs["metrics"] = metrics.to_dict()
             return df
         else:
             return None
 
     except Exception as e:
         print(f"Critical error: {e}")
+        metrics.set("critical_error", str(e))
         return None
     finally:
-        print("Closing browser...")
+        if driver is not None:
+            print("Releasing browser...")
+            run.release_driver(driver)
+        if save_backup:
+            # Written for failed and empty runs too, that's when it's needed most
+            try:
+                print(f"Run metrics saved to {metrics.write('inventory.csv')}")
+            except OSError as e:
+                print(f"Could not save run metrics: {e}")
+
+
+def iter_scrape(**kwargs):
+    """Run scrape_cartown in a background thread and yield its progress.
+
+    Yields {"type": "page", ...} events as pages come in (see scrape_cartown's
+    on_page) and finally {"type": "done", "df": df}. Events are handed over on
+    the caller's thread, so UIs that can only draw from their own thread
+    (Streamlit) can update live. An exception in the scrape is raised here.
+    """
+    events = queue.Queue()
+
+    def target():
         try:
-            driver.quit()
-        except:
-            pass
+            events.put({"type": "done", "df": scrape_cartown(on_page=events.put, **kwargs)})
+        except BaseException as e:
+            events.put({"type": "error", "error": e})
+
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    while True:
+        event = events.get()
+        if event["type"] == "error":
+            raise event["error"]
+        yield event
+        if event["type"] == "done":
+            break
+    thread.join()
 
 if __name__ == "__main__":
     scrape_cartown(scrape_all=False)
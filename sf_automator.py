@@ -1,18 +1,27 @@
 import streamlit as st
-import subprocess
 import os
-import pandas as pd
-import json
 import shutil
 import time
+import io
+import pandas as pd
 from datetime import datetime
+from vehicle_json import extract_reports, summarize_stats, vehicles_to_dataframe, stream_convert, preview_output, iter_output_records
+from inventory_store import InventoryStore
+from inventory_schema import write_typed
+from metrics import RunMetrics, summary_rows
+from dedupe import POLICIES, POLICY_LABELS
+from page_discovery import discover_page_count, pagination_urls
+from sf_runner import CrawlRunner, ShardedCrawl, build_command, find_reports, SF_PATH, DEFAULT_TIMEOUT
 
 st.set_page_config(page_title="Screaming Frog Automator", page_icon="🐸", layout="wide")
 
 # --- CONFIGURATION ---
-SF_PATH = r"C:\Program Files (x86)\Screaming Frog SEO Spider\ScreamingFrogSEOSpider.exe"
+# SF_PATH comes from sf_runner (set the SF_PATH environment variable to override it)
 OUTPUT_DIR = os.path.join(os.getcwd(), "auto_crawl_data")
 URL_LIST_FILE = os.path.join(os.getcwd(), "urls_to_crawl.txt")
+LIVE_PREVIEW_ROWS = 200  # Rows shown while a streaming conversion is running
+LOG_LINES_SHOWN = 15  # Last Screaming Frog output lines shown during the crawl
+DOWNLOAD_MAX_MB = 200  # Bigger streamed outputs aren't offered as a download (Streamlit holds it in memory), only their path
 
 st.title("🐸 Screaming Frog Auto-Bot")
 st.markdown("Run your configured Screaming Frog spider directly from this dashboard.")
@@ -28,7 +37,10 @@ manual_urls = ""
 with tab1:
     st.info("Uses the `?_p=X` pattern to automatically crawl multiple pages.")
     base_url = st.text_input("Base Inventory URL", value="https://www.cartownlexington.com/new-vehicles/")
-    pages = st.number_input("Number of pages to crawl", min_value=1, max_value=200, value=30)
+    discover = st.checkbox("Detect the real number of pages first", value=True,
+                           help="Probes the site for its last page, so Screaming Frog only crawls pages that exist.")
+    pages = st.number_input("Max pages to crawl" if discover else "Number of pages to crawl",
+                            min_value=1, max_value=200, value=30)
     mode = "auto"
 
 with tab2:
@@ -37,6 +49,36 @@ with tab2:
     if manual_urls.strip():
         mode = "manual"
 
+# --- OUTPUT OPTIONS ---
+with st.expander("⚙️ Output Options"):
+    stream_mode = st.checkbox("Streaming mode (for very large crawls)", value=False,
+                              help="Reads the export in chunks and writes rows straight to disk, so memory stays flat.")
+    out_format = st.selectbox("Output format", ["csv", "parquet"])
+    dedupe = st.selectbox("Repeated vehicles (same VIN / stock #)", POLICIES, format_func=POLICY_LABELS.get,
+                          help="Featured vehicles show up on several pages; only one row per vehicle is kept.")
+    track_changes = st.checkbox("Track changes between runs (local inventory store)", value=True)
+    crawl_timeout = st.number_input("Crawl timeout (minutes)", min_value=1, max_value=24 * 60,
+                                    value=max(1, DEFAULT_TIMEOUT // 60),
+                                    help="Screaming Frog is stopped if the crawl takes longer than this.")
+    shards = st.number_input("Parallel Screaming Frog instances", min_value=1, max_value=8, value=1,
+                             help="Splits the URL list and crawls the parts at the same time. Each instance needs its own share of RAM.")
+
+if st.session_state.pop("sf_cancelled", False):
+    st.warning("⏹️ The last crawl was cancelled.")
+
+def show_metrics(metrics, output_path):
+    # Same numbers as the JSON saved next to the output; also called before the run stops early
+    try:
+        metrics_file = metrics.write(output_path)
+    except OSError as e:
+        metrics_file = None
+        st.warning(f"Could not save run metrics: {e}")
+    with st.expander("📈 Run metrics"):
+        st.dataframe(pd.DataFrame(summary_rows(metrics.to_dict())), hide_index=True, use_container_width=True)
+        if metrics_file:
+            st.caption(f"Saved to `{metrics_file}`")
+
+
 # --- RUNNER ---
 if st.button("🚀 Start Crawl & Extract", type="primary"):
     
@@ -44,6 +86,7 @@ if st.button("🚀 Start Crawl & Extract", type="primary"):
         st.error(f"❌ Screaming Frog application not found at: `{SF_PATH}`")
         st.stop()
     
+    metrics = RunMetrics("sf_automator")
     # UI Container for status
     status_container = st.status("Running Automation...", expanded=True)
     
@@ -53,10 +96,17 @@ if st.button("🚀 Start Crawl & Extract", type="primary"):
         with open(URL_LIST_FILE, "w") as f:
             if mode == "auto" and not manual_urls.strip():
                 # Auto Generation
-                for i in range(pages):
-                    sep = "&" if "?" in base_url else "?"
-                    f.write(f"{base_url}{sep}_p={i}\n")
-                status_container.write(f"✅ Generated {pages} pagination URLs from base.")
+                page_count = pages
+                if discover:
+                    status_container.write("🔎 Detecting page count...")
+                    with metrics.timer("discovery"):
+                        page_count, method = discover_page_count(base_url, max_pages=pages)
+                    metrics.set("discovery_method", method)
+                    if method == "fallback":
+                        status_container.write(f"⚠️ Page count could not be detected over plain HTTP, using all {pages} pages.")
+                for url in pagination_urls(base_url, page_count):
+                    f.write(url + "\n")
+                status_container.write(f"✅ Generated {page_count} pagination URLs from base.")
             else:
                 # Manual List
                 # Prioritize manual list if the user entered text in that tab (or if strictly selected, but tabs are visual)
@@ -66,9 +116,8 @@ if st.button("🚀 Start Crawl & Extract", type="primary"):
                     # Fallback to auto if empty
                     if mode == "auto":
                         # Re-run auto generation logic (duplication strictness is low priority here)
-                         for i in range(pages):
-                            sep = "&" if "?" in base_url else "?"
-                            f.write(f"{base_url}{sep}_p={i}\n")
+                         for url in pagination_urls(base_url, pages):
+                            f.write(url + "\n")
                     else:
                         st.error("Please paste at least one URL.")
                         st.stop()
@@ -87,101 +136,191 @@ if st.button("🚀 Start Crawl & Extract", type="primary"):
     
     # Clean output dir
     if os.path.exists(OUTPUT_DIR):
-        try: shutil.rmtree(OUTPUT_DIR)
-        except: pass
+        try:
+            shutil.rmtree(OUTPUT_DIR)
+        except OSError as e:
+            status_container.write(f"⚠️ Could not clear the old crawl data ({e}), old reports may be mixed in.")
     if not os.path.exists(OUTPUT_DIR):
         os.makedirs(OUTPUT_DIR)
         
-    cmd = [
-        SF_PATH,
-        "--list-mode", os.path.abspath(URL_LIST_FILE),
-        "--headless",
-        "--output-folder", os.path.abspath(OUTPUT_DIR),
-        "--export-custom-extraction"
-    ]
-    
+    if shards > 1:
+        runner = ShardedCrawl(URL_LIST_FILE, OUTPUT_DIR, int(shards), timeout=crawl_timeout * 60)
+        status_container.write(f"🧩 Split the URL list over {len(runner.runners)} Screaming Frog instances.")
+    else:
+        runner = CrawlRunner(build_command(URL_LIST_FILE, OUTPUT_DIR), timeout=crawl_timeout * 60,
+                             log_path=os.path.join(OUTPUT_DIR, "screaming_frog.log"))
     try:
-        # We run with timeout to prevent infinite hangs, but SF can be slow. 5 mins?
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        # Check output? SF output is verbose.
-        status_container.write("✅ Crawl finished. Checking for data reports...")
-        
-    except Exception as e:
+        runner.start()
+    except OSError as e:
         status_container.update(state="error")
         st.error(f"Screaming Frog execution failed: {e}")
         st.stop()
 
+    def cancel_crawl():
+        runner.cancel()
+        st.session_state["sf_cancelled"] = True
+
+    # Clicking Cancel reruns the script, which interrupts the loop below; the
+    # finally block then makes sure the crawl doesn't keep running unseen
+    status_container.button("⏹️ Cancel Crawl", on_click=cancel_crawl)
+    crawl_progress = status_container.empty()
+    crawl_log = status_container.empty()
+    try:
+        while runner.running:
+            if runner.poll():
+                crawl_log.code("\n".join(list(runner.tail)[-LOG_LINES_SHOWN:]), language=None)
+            crawl_progress.write(f"🕷️ {runner.progress_text()}")
+            time.sleep(0.5)
+        runner.poll()
+    finally:
+        runner.cancel()
+
+    crawl_progress.empty()
+    crawl_log.empty()
+    metrics.add_time("crawl", runner.elapsed)
+    metrics.count("urls_crawled", runner.progress.get("completed", 0))
+    metrics.set("crawl_status", runner.status)
+    metrics.set("shards", int(shards))
+    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
+    final_filename = f"Cleaned_Inventory_{timestamp}.{out_format}"
+    if runner.status == "timeout":
+        status_container.update(state="error")
+        st.error(f"⏱️ Screaming Frog was stopped after {crawl_timeout} minutes ({runner.summary()}).")
+        show_metrics(metrics, final_filename)
+        st.stop()
+    if runner.status != "ok":
+        status_container.write(f"⚠️ Screaming Frog exited with code {runner.returncode}, checking for reports anyway...")
+    status_container.write(f"✅ Crawl finished ({runner.summary()}). Checking for data reports...")
+
     # 3. Process Data
     status_container.write("🧹 Parsing and cleaning JSON data...")
     
-    report_files = [f for f in os.listdir(OUTPUT_DIR) if f.endswith(".csv") and "custom_extraction" in f.lower()]
+    # One report per shard when the crawl was split
+    report_paths = find_reports(OUTPUT_DIR)
     
-    if not report_files:
+    if not report_paths:
         status_container.update(state="error")
         st.error("❌ No Custom Extraction report found. Crawl may have failed or blocked.")
+        show_metrics(metrics, final_filename)
         st.stop()
 
-    csv_path = os.path.join(OUTPUT_DIR, report_files[0])
+    mime = "text/csv" if out_format == "csv" else "application/octet-stream"
     
     try:
-        # Flexible Read
-        try: df = pd.read_csv(csv_path)
-        except: df = pd.read_csv(csv_path, encoding='latin1')
-        
-        # Scan for JSON
-        json_cols = [col for col in df.columns if df[col].astype(str).str.contains('{"', regex=False).any()]
-        
-        all_vehicles = []
-        for index, row in df.iterrows():
-            for col in json_cols:
-                val = row[col]
-                if pd.isna(val): continue
-                val = str(val).strip()
-                if val.startswith("{") and val.endswith("}"):
-                    try:
-                        data = json.loads(val)
-                        all_vehicles.append(data)
-                    except:
-                        try:
-                            data = json.loads(val.replace('""', '"'))
-                            all_vehicles.append(data)
-                        except:
-                             pass
+        if stream_mode:
+            # Chunked read, rows go straight to the output file
+            progress_bar = status_container.progress(0.0, text="⏳ Reading export...")
+            live_table = status_container.empty()
+            live_rows = []
+
+            def show_progress(event):
+                # Running count plus the first rows, growing as chunks come in
+                progress_bar.progress(event["fraction"], text=f"⏳ Chunk {event['chunk']} done, {event['total']} vehicles so far...")
+                if len(live_rows) < LIVE_PREVIEW_ROWS:
+                    live_rows.extend(event["vehicles"][:LIVE_PREVIEW_ROWS - len(live_rows)])
+                    live_table.dataframe(vehicles_to_dataframe(live_rows))
+
+            with metrics.timer("stream_convert"):
+                result = stream_convert(report_paths, final_filename, progress=show_progress, dedupe=dedupe)
+            live_table.empty()
+            total = summarize_stats(result["stats"])
+            vehicle_count = result["vehicles"]
+            duplicates = result["duplicates"]
+        else:
+            # Parse and merge every report, collapsing repeated VINs
+            with metrics.timer("read_parse"):
+                all_vehicles, stats, duplicates = extract_reports(report_paths, dedupe=dedupe)
+            total = summarize_stats(stats)
+            vehicle_count = len(all_vehicles)
+        metrics.count("reports", len(report_paths))
+        metrics.add_counts(total, prefix="json_")
+        metrics.count("duplicates", duplicates)
+        metrics.count("vehicles", vehicle_count)
+        status_container.write(f"🧾 Parsed {total['parsed']} cells from {len(report_paths)} report(s), "
+                               f"fixed {total['fixed']}, failed {total['failed']}, dropped {duplicates} duplicates.")
                              
-        if not all_vehicles:
+        if not vehicle_count:
             status_container.update(state="complete")
             st.warning("⚠️ Screaming Frog ran successfully, but no Vehicle JSON data was found in the output. Check CSS Selectors.")
         else:
-            # Build Clean DF
-            clean_df = pd.DataFrame(all_vehicles)
+            if stream_mode:
+                preview_df = preview_output(final_filename)
+                # The file is already on disk; reading a huge one back would undo the flat memory
+                file_data = None
+                if os.path.getsize(final_filename) <= DOWNLOAD_MAX_MB * 1024 * 1024:
+                    with open(final_filename, "rb") as f:
+                        file_data = f.read()
+            else:
+                # Build Clean DF (priority columns first)
+                with metrics.timer("dataframe"):
+                    clean_df = vehicles_to_dataframe(all_vehicles)
+                preview_df = clean_df.head(50)
+                with metrics.timer("write"):
+                    if out_format == "parquet":
+                        buffer = io.BytesIO()
+                        write_typed(clean_df, buffer)
+                        file_data = buffer.getvalue()
+                    else:
+                        file_data = clean_df.to_csv(index=False).encode('utf-8')
             
-            # Sort
-            priority = ['vin', 'stock', 'year', 'make', 'model', 'trim', 'price', 'msrp', 'ext_color', 'int_color']
-            cols = clean_df.columns.tolist()
-            order = [c for c in priority if c in cols] + [c for c in cols if c not in priority]
-            clean_df = clean_df[order]
+            delta = None
+            delta_records = []
+            if track_changes:
+                # Manual URL lists may not cover the whole inventory, so no removals there
+                auto_run = mode == "auto" and not manual_urls.strip()
+                source = base_url if auto_run else "manual"
+                store = InventoryStore()
+                try:
+                    start = time.monotonic()
+                    run_id = store.begin_run(source)
+                    for batch in (iter_output_records(final_filename) if stream_mode else [all_vehicles]):
+                        store.upsert(run_id, source, batch)
+                    delta = store.finish_run(run_id, source, complete=auto_run)
+                    delta_records = store.delta_records(run_id)
+                    metrics.add_time("store", time.monotonic() - start)
+                finally:
+                    store.close()
             
             status_container.update(label="✅ Automation Complete!", state="complete", expanded=False)
             
-            st.success(f"🎉 Successfully extracted **{len(clean_df)}** vehicles!")
+            st.success(f"🎉 Successfully extracted **{vehicle_count}** vehicles!")
+            
+            if delta is not None:
+                d1, d2, d3 = st.columns(3)
+                d1.metric("New Since Last Run", delta["added"])
+                d2.metric("Removed", delta["removed"] if delta["complete"] else "n/a")
+                d3.metric("Price Changes", delta["price_changed"])
             
             st.divider()
             
             st.subheader("📊 Data Preview")
-            st.dataframe(clean_df.head(50))
+            st.dataframe(preview_df)
             
             # Download
-            timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M")
-            csv = clean_df.to_csv(index=False).encode('utf-8')
+            if file_data is None:
+                size_mb = os.path.getsize(final_filename) / (1024 * 1024)
+                st.info(f"📁 The file is {size_mb:,.0f} MB, too big to download through the browser. "
+                        f"It is saved at `{os.path.abspath(final_filename)}`.")
+            else:
+                st.download_button(
+                    label="📥 Download Final File",
+                    data=file_data,
+                    file_name=final_filename,
+                    mime=mime,
+                    type="primary"
+                )
             
-            st.download_button(
-                label="📥 Download Final CSV",
-                data=csv,
-                file_name=f"Cleaned_Inventory_{timestamp}.csv",
-                mime="text/csv",
-                type="primary"
-            )
+            if delta_records:
+                st.download_button(
+                    label="📥 Download Changes Only",
+                    data=pd.DataFrame(delta_records).to_csv(index=False).encode('utf-8'),
+                    file_name=f"Inventory_Delta_{timestamp}.csv",
+                    mime="text/csv"
+                )
 
     except Exception as e:
         status_container.update(state="error")
         st.error(f"Error processing data: {e}")
+        metrics.set("error", str(e))
+
+    show_metrics(metrics, final_filename)
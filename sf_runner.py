@@ -0,0 +1,308 @@
+import collections
+import os
+import queue
+import re
+import signal
+import subprocess
+import threading
+import time
+
+# Both can be overridden from the environment (e.g. a fake executable for testing)
+SF_PATH = os.environ.get("SF_PATH", r"C:\Program Files (x86)\Screaming Frog SEO Spider\ScreamingFrogSEOSpider.exe")
+DEFAULT_TIMEOUT = int(os.environ.get("SF_TIMEOUT", 30 * 60))  # Wall-clock seconds before the crawl is killed
+LOG_TAIL_LINES = 200  # Output lines kept in memory; the full log goes to log_path if given
+KILL_GRACE = 10  # Seconds between the polite stop and the hard kill
+
+# Screaming Frog logs lines like "SpiderProgress [mActive=4, mCompleted=120, mWaiting=30, mCompletion=80.0]"
+_PROGRESS_FIELDS = {
+    "active": re.compile(r"mActive=(\d+)"),
+    "completed": re.compile(r"mCompleted=(\d+)"),
+    "waiting": re.compile(r"mWaiting=(\d+)"),
+    "percent": re.compile(r"mCompletion=([\d.]+)"),
+}
+
+
+def build_command(url_list_file, output_dir, sf_path=None):
+    # List mode, headless, export the custom extraction to output_dir
+    return [
+        sf_path or SF_PATH,
+        "--list-mode", os.path.abspath(url_list_file),
+        "--headless",
+        "--output-folder", os.path.abspath(output_dir),
+        "--export-custom-extraction",
+    ]
+
+
+def parse_progress(line):
+    # {"completed": 120, "waiting": 30, ...} for a progress line, None for anything else
+    if "SpiderProgress" not in line:
+        return None
+    progress = {}
+    for key, pattern in _PROGRESS_FIELDS.items():
+        match = pattern.search(line)
+        if match:
+            progress[key] = float(match.group(1)) if key == "percent" else int(match.group(1))
+    return progress or None
+
+
+def split_urls(urls, shards):
+    # Contiguous slices of (almost) equal size, so each shard crawls neighbouring pages
+    shards = max(1, min(shards, len(urls)))
+    size, extra = divmod(len(urls), shards)
+    parts = []
+    start = 0
+    for i in range(shards):
+        end = start + size + (1 if i < extra else 0)
+        parts.append(urls[start:end])
+        start = end
+    return parts
+
+
+def find_reports(output_dir):
+    # Every custom extraction export under output_dir (one per shard folder when sharded)
+    reports = []
+    for root, _, files in os.walk(output_dir):
+        for name in files:
+            if name.endswith(".csv") and "custom_extraction" in name.lower():
+                reports.append(os.path.join(root, name))
+    return sorted(reports)
+
+
+class _CrawlProgress:
+    # Shared by CrawlRunner and ShardedCrawl: needs poll(), running, cancel(),
+    # status, progress and elapsed
+
+    @property
+    def urls_per_second(self):
+        completed = self.progress.get("completed", 0)
+        return completed / self.elapsed if self.elapsed else 0.0
+
+    def wait(self, on_lines=None, interval=0.5):
+        # Blocking loop for scripts; on_lines(lines, runner) is called with each batch of output
+        try:
+            while True:
+                lines = self.poll()
+                if lines and on_lines:
+                    on_lines(lines, self)
+                if not self.running:
+                    return self.status
+                time.sleep(interval)
+        finally:
+            # Ctrl+C or an error in on_lines must not leave the crawl running
+            if self.running:
+                self.cancel()
+
+    def summary(self):
+        completed = self.progress.get("completed")
+        text = f"{self.status} after {self.elapsed:.0f}s"
+        if completed is not None:
+            text += f", {completed} URLs crawled ({self.urls_per_second:.1f}/s)"
+        return text
+
+    def progress_text(self):
+        completed = self.progress.get("completed", 0)
+        text = f"{completed} URLs crawled, {self.urls_per_second:.1f}/s, {self.elapsed:.0f}s elapsed"
+        if "percent" in self.progress:
+            text = f"{self.progress['percent']:.0f}% - " + text
+        return text
+
+
+class CrawlRunner(_CrawlProgress):
+    """Screaming Frog running in the background, with its output tailed line by line.
+
+    start() launches the process. poll() hands back the new output lines and
+    enforces the timeout, so a UI can refresh between calls. wait() does the
+    same in a loop for scripts. cancel() and the timeout stop the whole
+    process tree (Screaming Frog starts a Java child process).
+    """
+
+    def __init__(self, cmd, timeout=DEFAULT_TIMEOUT, log_path=None):
+        self.cmd = cmd
+        self.timeout = timeout
+        self.log_path = log_path
+        self.process = None
+        self.started_at = None
+        self.finished_at = None
+        self.status = "pending"  # running / ok / failed / timeout / cancelled
+        self.progress = {}
+        self.tail = collections.deque(maxlen=LOG_TAIL_LINES)
+        self._lines = queue.Queue()
+        self._reader = None
+
+    def start(self):
+        kwargs = {}
+        if os.name == "nt":
+            kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP
+        else:
+            kwargs["start_new_session"] = True
+        self.process = subprocess.Popen(self.cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                        stdin=subprocess.DEVNULL, text=True, errors="replace", bufsize=1,
+                                        **kwargs)
+        self.started_at = time.monotonic()
+        self.status = "running"
+        self._reader = threading.Thread(target=self._read_output, daemon=True)
+        self._reader.start()
+        return self
+
+    def _read_output(self):
+        log = open(self.log_path, "w", encoding="utf-8") if self.log_path else None
+        try:
+            for line in self.process.stdout:
+                line = line.rstrip()
+                if log is not None:
+                    log.write(line + "\n")
+                self._lines.put(line)
+        finally:
+            if log is not None:
+                log.close()
+            self.process.stdout.close()
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def running(self):
+        return self.status == "running"
+
+    @property
+    def returncode(self):
+        return self.process.returncode if self.process is not None else None
+
+    def poll(self):
+        # New output lines since the last call; also notices exit and timeout
+        lines = []
+        while True:
+            try:
+                line = self._lines.get_nowait()
+            except queue.Empty:
+                break
+            lines.append(line)
+            self.tail.append(line)
+            progress = parse_progress(line)
+            if progress:
+                self.progress.update(progress)
+
+        if self.running:
+            if self.process.poll() is not None:
+                self._reader.join(timeout=5)
+                self.finished_at = time.monotonic()
+                self.status = "ok" if self.process.returncode == 0 else "failed"
+                return lines + self.poll()
+            if self.timeout and self.elapsed > self.timeout:
+                self.stop("timeout")
+        return lines
+
+    def cancel(self):
+        self.stop("cancelled")
+
+    def stop(self, status):
+        if not self.running:
+            return
+        self.status = status
+        self.finished_at = time.monotonic()
+        self._kill_tree()
+
+    def _kill_tree(self):
+        process = self.process
+        if process.poll() is not None:
+            return
+        try:
+            if os.name == "nt":
+                # /T takes the Java child along, /F if it doesn't stop on its own
+                subprocess.run(["taskkill", "/PID", str(process.pid), "/T"], capture_output=True)
+                try:
+                    process.wait(KILL_GRACE)
+                except subprocess.TimeoutExpired:
+                    subprocess.run(["taskkill", "/PID", str(process.pid), "/T", "/F"], capture_output=True)
+            else:
+                os.killpg(process.pid, signal.SIGTERM)
+                try:
+                    process.wait(KILL_GRACE)
+                except subprocess.TimeoutExpired:
+                    os.killpg(process.pid, signal.SIGKILL)
+        except (OSError, ProcessLookupError):
+            pass
+        try:
+            process.wait(KILL_GRACE)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+class ShardedCrawl(_CrawlProgress):
+    """Several Screaming Frog instances at once, each crawling one slice of the URL list.
+
+    Shard i gets its own folder (<output_dir>/shard_i) holding its URL list,
+    log and exports; use find_reports(output_dir) to collect them afterwards.
+    Same interface as CrawlRunner, output lines are prefixed with the shard.
+    """
+
+    def __init__(self, url_list_file, output_dir, shards, timeout=DEFAULT_TIMEOUT, sf_path=None):
+        with open(url_list_file, "r", encoding="utf-8") as f:
+            urls = [line.strip() for line in f if line.strip()]
+        self.runners = []
+        for i, part in enumerate(split_urls(urls, shards), 1):
+            shard_dir = os.path.join(output_dir, f"shard_{i}")
+            os.makedirs(shard_dir, exist_ok=True)
+            list_file = os.path.join(shard_dir, "urls.txt")
+            with open(list_file, "w", encoding="utf-8") as f:
+                f.write("\n".join(part) + "\n")
+            self.runners.append(CrawlRunner(build_command(list_file, shard_dir, sf_path), timeout,
+                                            os.path.join(shard_dir, "screaming_frog.log")))
+        self.tail = collections.deque(maxlen=LOG_TAIL_LINES)
+
+    def start(self):
+        try:
+            for runner in self.runners:
+                runner.start()
+        except OSError:
+            self.cancel()
+            raise
+        return self
+
+    @property
+    def running(self):
+        return any(runner.running for runner in self.runners)
+
+    @property
+    def status(self):
+        if self.running:
+            return "running"
+        statuses = {runner.status for runner in self.runners}
+        for status in ("cancelled", "timeout", "failed"):
+            if status in statuses:
+                return status
+        return "ok"
+
+    @property
+    def returncode(self):
+        # First non-zero exit code, so a single failed shard shows up
+        codes = [runner.returncode for runner in self.runners]
+        return next((code for code in codes if code), codes[0] if codes else None)
+
+    @property
+    def elapsed(self):
+        return max((runner.elapsed for runner in self.runners), default=0.0)
+
+    @property
+    def progress(self):
+        progress = {"completed": sum(r.progress.get("completed", 0) for r in self.runners)}
+        percents = [r.progress["percent"] for r in self.runners if "percent" in r.progress]
+        if len(percents) == len(self.runners):
+            progress["percent"] = sum(percents) / len(percents)
+        return progress
+
+    def poll(self):
+        lines = []
+        for i, runner in enumerate(self.runners, 1):
+            for line in runner.poll():
+                line = f"[shard {i}] {line}"
+                lines.append(line)
+                self.tail.append(line)
+        return lines
+
+    def cancel(self):
+        for runner in self.runners:
+            runner.cancel()
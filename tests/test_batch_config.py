@@ -0,0 +1,18 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from batch_runner import ConfigError, load_jobs
+
+
+def test_single_url_site_without_name():
+    _, jobs = load_jobs({"sites": [{"url": "https://www.example-dealer.com/new-vehicles/"}]})
+    assert [(job["site"], job["url"]) for job in jobs] == [("www.example-dealer.com", "https://www.example-dealer.com/new-vehicles/")]
+
+
+def test_site_without_urls_is_a_config_error():
+    with pytest.raises(ConfigError, match="site #2"):
+        load_jobs({"sites": [{"url": "https://a.example.com/"}, {"site": "Nowhere"}]})
@@ -0,0 +1,60 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from fake_driver import FixtureDriver
+from inventory_store import InventoryStore
+from scrape_inventory import scrape_cartown
+
+URL = "https://example.com/new-vehicles/"
+PAGES = 5
+
+
+class FailingDriver(FixtureDriver):
+    # Page fail_on never loads, like a timeout or a crashed tab
+    def __init__(self, fail_on, **kwargs):
+        super().__init__(**kwargs)
+        self.fail_on = fail_on
+
+    def get(self, url):
+        super().get(url)
+        if self.visited[-1] == self.fail_on:
+            raise RuntimeError("page load failed")
+
+
+def scrape(store, driver_factory, workers):
+    return scrape_cartown(url=URL, scrape_all=True, workers=workers, rate_limit=0, driver_factory=driver_factory,
+                          store=store, checkpoint=None, save_backup=False)
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_failed_page_records_no_removals(tmp_path, workers):
+    store = InventoryStore(str(tmp_path / "store.db"))
+    try:
+        first = scrape(store, lambda *a, **k: FixtureDriver(pages=PAGES, size="small"), workers)
+        assert first.attrs["delta"]["complete"]
+
+        df = scrape(store, lambda *a, **k: FailingDriver(2, pages=PAGES, size="small"), workers)
+        delta = df.attrs["delta"]
+        assert not df.attrs["complete"]  # What batch_runner records the job with
+        assert not delta["complete"]
+        assert delta["removed"] == 0
+    finally:
+        store.close()
+
+
+def test_full_crawl_still_records_removals(tmp_path):
+    store = InventoryStore(str(tmp_path / "store.db"))
+    try:
+        scrape(store, lambda *a, **k: FixtureDriver(pages=PAGES, size="small"), 1)
+        # One page less on the site: its vehicles are gone
+        delta = scrape(store, lambda *a, **k: FixtureDriver(pages=PAGES - 1, size="small"), 1).attrs["delta"]
+        assert delta["complete"]
+        assert delta["removed"] == 12
+    finally:
+        store.close()
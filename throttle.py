@@ -0,0 +1,32 @@
+import threading
+import time
+import urllib.parse
+
+
+def domain_of(url):
+    return urllib.parse.urlparse(url).netloc.lower()
+
+
+class DomainRateLimiter:
+    """Keeps requests to the same domain at least min_interval seconds apart.
+
+    Shared between worker threads: each caller reserves the next free slot
+    for its domain under a lock, then sleeps outside of it until that slot.
+    """
+
+    def __init__(self, min_interval=2.0):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot = {}
+
+    def wait(self, url):
+        if not self.min_interval:
+            return
+        domain = domain_of(url)
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(domain, now))
+            self._next_slot[domain] = slot + self.min_interval
+        delay = slot - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
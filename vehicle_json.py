@@ -0,0 +1,382 @@
+import csv
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from dedupe import DEFAULT_POLICY, Deduper, check_policy, collapse_repeats, vehicle_key
+from records import VehicleColumns
+# The JSON decoding lives in parallel_parse so worker processes don't load pandas
+from parallel_parse import OUTCOMES, PARSE_PROCESSES, parse_cells, loads as _loads
+
+# Key fields shown first in every cleaned export
+PRIORITY_COLS = ['vin', 'stock', 'year', 'make', 'model', 'trim', 'price', 'msrp', 'ext_color', 'int_color']
+
+# How many non-empty cells per column we look at when guessing JSON columns
+DETECT_SAMPLE_SIZE = 50
+
+# Rows read per chunk in streaming mode
+STREAM_CHUNKSIZE = 5000
+
+
+def find_json_columns(df, sample_size=DETECT_SAMPLE_SIZE):
+    # Screaming Frog usually names them "Vehicle Data 1", "Vehicle Data 2", etc.
+    # Only a sample of the non-empty cells is checked instead of the full column.
+    json_cols = []
+    for col in df.columns:
+        sample = df[col].dropna().head(sample_size)
+        if sample.empty:
+            continue
+        if sample.astype(str).str.contains('{"', regex=False).any():
+            json_cols.append(col)
+    return json_cols
+
+
+def extract_vehicles(df, json_cols=None, out=None, processes=1, progress=None):
+    """Parse every JSON cell of the given columns.
+
+    Returns (vehicles, stats) where vehicles keeps the original row-by-row,
+    column-by-column order and stats maps each column to its
+    parsed / fixed / failed / skipped counts. Vehicles are appended to out
+    when given (e.g. a VehicleColumns, or a Deduper filling one) instead of
+    a new list. With processes > 1 a large export is decoded in shards on
+    that many worker processes (see parallel_parse); progress(done, total)
+    is called as each shard is merged.
+    """
+    if json_cols is None:
+        json_cols = find_json_columns(df)
+
+    vehicles = [] if out is None else out
+    stats = {col: {"parsed": 0, "fixed": 0, "failed": 0, "skipped": 0} for col in json_cols}
+    if not json_cols or df.empty:
+        return vehicles, stats
+
+    # Stack the candidate columns into one Series (row-major, so the output
+    # order matches reading the sheet row by row).
+    values = df[json_cols].to_numpy(dtype=object).ravel()
+    labels = np.tile(np.arange(len(json_cols)), len(df))
+    cells = pd.Series(values, dtype=object)
+
+    present = cells.notna().to_numpy()
+    cells = cells[present].astype(str).str.strip()
+    labels = labels[present]
+
+    looks_like_json = (cells.str.startswith("{") & cells.str.endswith("}")).to_numpy()
+    skipped = np.bincount(labels[~looks_like_json], minlength=len(json_cols))
+    cells = cells[looks_like_json]
+    labels = labels[looks_like_json]
+
+    for values, keys, counts in parse_cells(cells.tolist(), labels.tolist(), len(json_cols), processes, progress):
+        if keys is None:
+            for data in values:
+                vehicles.append(data)
+        elif isinstance(vehicles, Deduper):
+            vehicles.add_batch(values, keys)
+        elif isinstance(vehicles, VehicleColumns):
+            vehicles.extend_rows(values)
+        else:
+            vehicles.extend(values)
+        for i, col in enumerate(json_cols):
+            for outcome in OUTCOMES:
+                stats[col][outcome] += counts[i][outcome]
+
+    for i, col in enumerate(json_cols):
+        stats[col]["skipped"] = int(skipped[i])
+
+    return vehicles, stats
+
+
+def merge_stats(total, stats):
+    # Add one export's per-column counts into total (same column names are summed)
+    for col, counts in stats.items():
+        target = total.setdefault(col, dict.fromkeys(counts, 0))
+        for key, value in counts.items():
+            target[key] += value
+    return total
+
+
+def extract_reports(paths, dedupe=DEFAULT_POLICY, processes=PARSE_PROCESSES):
+    """Parse several Screaming Frog exports (e.g. one per crawl shard) into one table.
+
+    Returns (vehicles, stats, duplicates): vehicles in report order as a
+    compact VehicleColumns, with repeated VINs / stock numbers collapsed by
+    the dedupe policy (see dedupe.POLICIES; None keeps every copy). Large
+    reports are decoded on processes worker processes.
+    """
+    deduper = Deduper(dedupe, VehicleColumns())
+    stats = {}
+    for path in paths:
+        df = read_export(path)
+        _, report_stats = extract_vehicles(df, find_json_columns(df), out=deduper, processes=processes)
+        merge_stats(stats, report_stats)
+    return deduper.vehicles, stats, deduper.duplicates
+
+
+def order_columns(df, priority=PRIORITY_COLS):
+    # Priority ones first (if they exist), then the rest
+    cols = df.columns.tolist()
+    order = [c for c in priority if c in cols] + [c for c in cols if c not in priority]
+    return df[order]
+
+
+def vehicles_to_dataframe(vehicles):
+    # A VehicleColumns is turned into a table column by column, without going through dicts
+    if isinstance(vehicles, VehicleColumns):
+        return order_columns(vehicles.to_dataframe())
+    return order_columns(pd.DataFrame(vehicles))
+
+
+def summarize_stats(stats):
+    total = {"parsed": 0, "fixed": 0, "failed": 0, "skipped": 0}
+    for counts in stats.values():
+        for key in total:
+            total[key] += counts[key]
+    return total
+
+
+def format_stats(stats):
+    lines = []
+    for col, counts in stats.items():
+        lines.append(f"{col}: {counts['parsed']} parsed, {counts['fixed']} fixed, "
+                     f"{counts['failed']} failed, {counts['skipped']} skipped")
+    return lines
+
+
+def read_export(path_or_buffer, **kwargs):
+    # Read properly handling potential encoding issues (common with Excel exports)
+    try:
+        return pd.read_csv(path_or_buffer, **kwargs)
+    except UnicodeDecodeError:
+        if hasattr(path_or_buffer, "seek"):
+            path_or_buffer.seek(0)
+        return pd.read_csv(path_or_buffer, encoding='latin1', **kwargs)
+
+
+def output_format(path):
+    ext = os.path.splitext(path)[1].lower()
+    return "parquet" if ext in (".parquet", ".pq") else "csv"
+
+
+def _iter_spool(spool_path):
+    with open(spool_path, "r", encoding="utf-8") as f:
+        for line in f:
+            yield _loads(line)
+
+
+def _write_csv(vehicles, output_path, columns):
+    with open(output_path, "w", newline="", encoding="utf-8") as out:
+        writer = csv.DictWriter(out, fieldnames=columns, restval="", extrasaction="ignore")
+        writer.writeheader()
+        for vehicle in vehicles:
+            writer.writerow(vehicle)
+
+
+def _write_parquet(vehicles, output_path, columns, batch_size):
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("Parquet output needs pyarrow (pip install pyarrow)")
+    from inventory_schema import stream_schema, to_arrow_table
+
+    # Known fields get their declared types (numeric price/year, categorical colors, ...)
+    schema = stream_schema(columns)
+    writer = pq.ParquetWriter(output_path, schema)
+    try:
+        batch = []
+        for vehicle in vehicles:
+            batch.append(vehicle)
+            if len(batch) >= batch_size:
+                writer.write_table(to_arrow_table(pd.DataFrame(batch, columns=columns), schema))
+                batch = []
+        if batch:
+            writer.write_table(to_arrow_table(pd.DataFrame(batch, columns=columns), schema))
+    finally:
+        writer.close()
+
+
+class _KeyIndex:
+    """How often each VIN / stock key came up while spooling.
+
+    Kept in a temporary SQLite file rather than a dict, so memory doesn't
+    grow with the number of distinct vehicles in the export.
+    """
+
+    LOOKUP_BATCH = 500  # Keys per lookup query (older SQLite builds allow 999 parameters)
+
+    def __init__(self, path):
+        import sqlite3
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        # Scratch data: no journal, no fsync
+        self.conn.execute("PRAGMA journal_mode = OFF")
+        self.conn.execute("PRAGMA synchronous = OFF")
+        self.conn.execute("CREATE TABLE keys (key TEXT PRIMARY KEY, n INTEGER) WITHOUT ROWID")
+
+    def seen(self, keys):
+        # Those of keys already counted by an earlier chunk
+        keys = list(keys)
+        found = set()
+        for start in range(0, len(keys), self.LOOKUP_BATCH):
+            batch = keys[start:start + self.LOOKUP_BATCH]
+            query = f"SELECT key FROM keys WHERE key IN ({','.join('?' * len(batch))})"
+            found.update(row[0] for row in self.conn.execute(query, batch))
+        return found
+
+    def add(self, counts):
+        # counts: {key: occurrences in one chunk}
+        self.conn.executemany("INSERT INTO keys VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET n = n + excluded.n",
+                              counts.items())
+        self.conn.commit()
+
+    def repeated(self):
+        # {key: count} of the keys seen more than once; only these are needed to collapse the copies
+        return dict(self.conn.execute("SELECT key, n FROM keys WHERE n > 1"))
+
+    def close(self):
+        self.conn.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+def _spool_chunks(csv_paths, spool, index, chunksize, encoding, progress, policy):
+    # index (a _KeyIndex) counts how often each VIN / stock key came up. "first"
+    # drops repeats right here; for "latest" / "merge" every copy is spooled,
+    # to be collapsed when the output is written (see collapse_repeats)
+    json_cols = []
+    keys = {}
+    stats = {}
+    vehicle_count = 0
+    duplicates = 0
+    chunk_count = 0
+    total_size = sum(os.path.getsize(path) for path in csv_paths) or 1
+    done_size = 0
+
+    for csv_path in csv_paths:
+        # Opened here in binary mode so the read position tells how far we are
+        with open(csv_path, "rb") as f:
+            for chunk in pd.read_csv(f, chunksize=chunksize, encoding=encoding):
+                # Known JSON columns are reused, only the rest get sampled again
+                # (a column can be empty for the first few thousand rows)
+                pending = [c for c in chunk.columns if c not in stats]
+                for col in find_json_columns(chunk[pending]):
+                    json_cols.append(col)
+                    stats[col] = {"parsed": 0, "fixed": 0, "failed": 0, "skipped": 0}
+
+                vehicles, chunk_stats = extract_vehicles(chunk, [c for c in json_cols if c in chunk.columns])
+                merge_stats(stats, chunk_stats)
+
+                vehicles = [vehicle for vehicle in vehicles if isinstance(vehicle, dict)]
+                vehicle_keys = [vehicle_key(vehicle) for vehicle in vehicles] if policy else [None] * len(vehicles)
+                seen = index.seen({key for key in vehicle_keys if key is not None}) if policy else set()
+                counts = {}  # This chunk's keys
+                new_vehicles = []
+                for vehicle, key in zip(vehicles, vehicle_keys):
+                    if key is not None and (key in seen or key in counts):
+                        duplicates += 1
+                        if policy == "first":
+                            continue
+                        counts[key] = counts.get(key, 0) + 1
+                    else:
+                        if key is not None:
+                            counts[key] = 1
+                        new_vehicles.append(vehicle)
+                    for field in vehicle:
+                        keys.setdefault(field, None)
+                    spool.write(json.dumps(vehicle) + "\n")
+                if counts:
+                    index.add(counts)
+                vehicles = new_vehicles
+                vehicle_count += len(vehicles)
+
+                chunk_count += 1
+                if progress:
+                    progress({"chunk": chunk_count, "vehicles": vehicles, "total": vehicle_count,
+                              "fraction": min((done_size + f.tell()) / total_size, 1.0)})
+        done_size += os.path.getsize(csv_path)
+
+    return list(keys), stats, vehicle_count, chunk_count, duplicates
+
+
+def stream_convert(csv_path, output_path, chunksize=STREAM_CHUNKSIZE, priority=PRIORITY_COLS, progress=None,
+                   dedupe=DEFAULT_POLICY):
+    """Convert Screaming Frog export(s) chunk by chunk with flat memory use.
+
+    csv_path may also be a list of exports (e.g. one per crawl shard); they
+    are merged into one output. Repeated VINs / stock numbers are collapsed
+    by the dedupe policy (see dedupe.POLICIES, None keeps every copy). The
+    keys are counted in a temporary SQLite index, not in memory; "latest" /
+    "merge" hold the repeated vehicles (only those) while the output is written.
+    Parsed vehicles are spooled to a temporary JSON-lines file first because
+    the final header (priority columns, then every other key seen) is only
+    known once the whole export has been read. The output is then written
+    row by row as CSV, or in batches as Parquet when output_path ends in
+    .parquet. progress(event) is called per chunk with the chunk number,
+    its vehicles, the running total and the fraction of the input read.
+    """
+    csv_paths = [csv_path] if isinstance(csv_path, (str, os.PathLike)) else list(csv_path)
+    if dedupe:
+        check_policy(dedupe)
+    fd, spool_path = tempfile.mkstemp(suffix=".jsonl", prefix="sf_stream_")
+    os.close(fd)
+    index = None
+    try:
+        try:
+            index = _KeyIndex(spool_path + ".keys")
+            with open(spool_path, "w", encoding="utf-8") as spool:
+                keys, stats, vehicle_count, chunk_count, duplicates = _spool_chunks(
+                    csv_paths, spool, index, chunksize, None, progress, dedupe)
+        except UnicodeDecodeError:
+            # Start over with the Excel-style encoding
+            index.close()
+            index = _KeyIndex(spool_path + ".keys")
+            with open(spool_path, "w", encoding="utf-8") as spool:
+                keys, stats, vehicle_count, chunk_count, duplicates = _spool_chunks(
+                    csv_paths, spool, index, chunksize, "latin1", progress, dedupe)
+
+        columns = [c for c in priority if c in keys] + [c for c in keys if c not in priority]
+        if vehicle_count:
+            if duplicates and dedupe != "first":
+                vehicles = collapse_repeats(lambda: _iter_spool(spool_path), index.repeated(), dedupe)
+            else:
+                vehicles = _iter_spool(spool_path)
+            if output_format(output_path) == "parquet":
+                _write_parquet(vehicles, output_path, columns, chunksize)
+            else:
+                _write_csv(vehicles, output_path, columns)
+    finally:
+        if index is not None:
+            index.close()
+        os.remove(spool_path)
+
+    return {
+        "vehicles": vehicle_count,
+        "chunks": chunk_count,
+        "columns": columns,
+        "stats": stats,
+        "duplicates": duplicates,
+        "reports": len(csv_paths),
+        "output_path": output_path if vehicle_count else None,
+    }
+
+
+def preview_output(path, rows=50):
+    # Read only the first rows of a converted file
+    if output_format(path) == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=rows):
+            return batch.to_pandas()
+        return pd.DataFrame()
+    return pd.read_csv(path, nrows=rows)
+
+
+def iter_output_records(path, batch_size=STREAM_CHUNKSIZE):
+    # Re-read a converted file as lists of vehicle dicts without loading it whole
+    if output_format(path) == "parquet":
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size):
+            yield [{k: v for k, v in row.items() if v is not None} for row in batch.to_pylist()]
+        return
+    for chunk in pd.read_csv(path, chunksize=batch_size, dtype=str, keep_default_na=False):
+        yield [{k: v for k, v in row.items() if v != ""} for row in chunk.to_dict("records")]